@@ -0,0 +1,282 @@
+"""
+抓取脚本网络压测：启动本地模拟接口，依次运行各抓取脚本并统计
+吞吐、p50/p95/p99 延迟、CPU 时间、内存峰值与服务端状态码分布
+
+用法:
+    python bench/bench_fetchers.py --count 200 --latency-ms 50
+    python bench/bench_fetchers.py --fetchers getshopinfo sync_vids --rate-403 0.02 --output bench_fetchers.json
+默认去掉脚本内的 sleep 并关闭全局限速器，只衡量请求路径本身；加 --keep-sleeps 保留
+每个抓取脚本在独立子进程中运行，CPU 时间与内存峰值只包含该脚本
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_jd_server import DEFAULT_CONFIG, start_server
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = []
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        # 最近秩法
+        index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class _NoSleep:
+    """代理 time / asyncio 模块，只把 sleep 换成空操作"""
+
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+    def sleep(self, *args, **kwargs):
+        if self._module is asyncio:
+            return asyncio.sleep(0)
+        return None
+
+
+def _patch(obj, name, value, undo):
+    undo.append((obj, name, getattr(obj, name)))
+    setattr(obj, name, value)
+
+
+def _time_async_method(cls, name, recorder, undo):
+    original = getattr(cls, name)
+
+    async def timed(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await original(self, *args, **kwargs)
+        finally:
+            recorder.add(time.perf_counter() - start)
+
+    _patch(cls, name, timed, undo)
+
+
+def _time_method(cls, name, recorder, undo):
+    original = getattr(cls, name)
+
+    def timed(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            recorder.add(time.perf_counter() - start)
+
+    _patch(cls, name, timed, undo)
+
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+# ---------- 各抓取脚本的运行方式 ----------
+
+def run_getshopinfo(vids, recorder, keep_sleeps, undo):
+    import jd_client
+    import getshopinfo
+    _write_json("shop_info.json", {vid: {"shopId": "", "shopName": ""} for vid in vids})
+    _patch(getshopinfo, "MAX_QUERIES", len(vids), undo)
+    _patch(getshopinfo, "MAX_403_ERRORS", len(vids) + 1, undo)
+    if not keep_sleeps:
+        _patch(getshopinfo, "asyncio", _NoSleep(asyncio), undo)
+    _time_async_method(jd_client.AsyncJDClient, "get_shop_outline", recorder, undo)
+    asyncio.run(getshopinfo.run_task())
+
+
+def run_sync_vids(vids, recorder, keep_sleeps, undo):
+    import jd_client
+    import sync_vids
+    _write_json("old_vid.json", vids)
+    _write_json("new_vid.json", [])
+    _patch(sync_vids, "MAX_QUERY_COUNT", len(vids), undo)
+    _patch(sync_vids, "MAX_403_ERRORS", len(vids) + 1, undo)
+    if not keep_sleeps:
+        _patch(sync_vids, "asyncio", _NoSleep(asyncio), undo)
+    _time_async_method(jd_client.AsyncJDClient, "get_shop_outline", recorder, undo)
+    asyncio.run(sync_vids.main())
+
+
+def run_jd_fetch_requests(vids, recorder, keep_sleeps, undo):
+    import jd_client
+    import jd_fetch_requests
+    _write_json("vid.json", vids)
+    _patch(jd_fetch_requests, "MAX_CONTINUOUS_ERRORS", len(vids) + 1, undo)
+    if not keep_sleeps:
+        _patch(jd_fetch_requests, "time", _NoSleep(time), undo)
+    _time_method(jd_client.JDSession, "get_activity", recorder, undo)
+    jd_fetch_requests.run_task()
+
+
+def run_jd_fetch_playwright(vids, recorder, keep_sleeps, undo):
+    import jd_fetch_playwright
+    _write_json("vid.json", vids)
+    _patch(jd_fetch_playwright, "MAX_CONSECUTIVE_ERRORS", len(vids) + 1, undo)
+    if not keep_sleeps:
+        _patch(jd_fetch_playwright, "time", _NoSleep(time), undo)
+
+    # 页面对象由 PagePool 创建，给每个页面的 evaluate 套上计时
+    original_acquire = jd_fetch_playwright.PagePool.acquire
+
+    def acquire(self):
+        page, is_new = original_acquire(self)
+        if not getattr(page, "_bench_timed", False):
+            evaluate = page.evaluate
+
+            def timed_evaluate(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return evaluate(*args, **kwargs)
+                finally:
+                    recorder.add(time.perf_counter() - start)
+
+            page.evaluate = timed_evaluate
+            page._bench_timed = True
+        return page, is_new
+
+    _patch(jd_fetch_playwright.PagePool, "acquire", acquire, undo)
+    jd_fetch_playwright.run_task()
+
+
+FETCHERS = {
+    "getshopinfo": run_getshopinfo,
+    "sync_vids": run_sync_vids,
+    "jd_fetch_requests": run_jd_fetch_requests,
+    "jd_fetch_playwright": run_jd_fetch_playwright,
+}
+
+
+def measure(name, vids, keep_sleeps):
+    """在当前进程中运行一个抓取脚本并统计（在 bench_one 启动的子进程中执行）"""
+    recorder = LatencyRecorder()
+    undo = []
+    cwd = os.getcwd()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            FETCHERS[name](vids, recorder, keep_sleeps, undo)
+    except ImportError as e:
+        return {"fetcher": name, "skipped": str(e)}
+    except SystemExit:
+        pass  # 熔断时脚本会 sys.exit，照常统计
+    finally:
+        os.chdir(cwd)
+        for obj, attr, value in reversed(undo):
+            setattr(obj, attr, value)
+    wall = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    requests_made = len(recorder.samples)
+    return {
+        "fetcher": name,
+        "requests": requests_made,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(requests_made / wall, 2) if wall else 0.0,
+        "p50_ms": round(recorder.percentile(50) * 1000, 2),
+        "p95_ms": round(recorder.percentile(95) * 1000, 2),
+        "p99_ms": round(recorder.percentile(99) * 1000, 2),
+        "cpu_seconds": round((usage_after.ru_utime - usage_before.ru_utime)
+                             + (usage_after.ru_stime - usage_before.ru_stime), 3),
+        "max_rss_mb": round(usage_after.ru_maxrss / 1024, 1),  # 子进程峰值，只含本脚本（Linux 下单位为 KB）
+    }
+
+
+def bench_one(name, count, stats, keep_sleeps):
+    """
+    在独立子进程中运行一个抓取脚本：前一个脚本的内存峰值不会计入后一个
+    子进程继承已设置好的模拟服务环境变量；服务端状态码按运行前后的差值统计
+    """
+    before_counts = stats.snapshot()
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "result.json")
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", name,
+               "--count", str(count), "--child-output", output]
+        if keep_sleeps:
+            cmd.append("--keep-sleeps")
+        returncode = subprocess.run(cmd).returncode
+        if not os.path.exists(output):
+            return {"fetcher": name, "skipped": f"子进程异常退出（返回码 {returncode}）"}
+        with open(output, encoding='utf-8') as f:
+            result = json.load(f)
+    if "skipped" not in result:
+        after_counts = stats.snapshot()
+        result["server_status"] = {k: after_counts.get(k, 0) - before_counts.get(k, 0)
+                                   for k in after_counts if after_counts.get(k, 0) != before_counts.get(k, 0)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓取脚本离线网络压测")
+    parser.add_argument("--fetchers", nargs="+", choices=sorted(FETCHERS), default=list(FETCHERS))
+    parser.add_argument("--count", type=int, default=200, help="每个脚本处理的 VID 数量")
+    parser.add_argument("--keep-sleeps", action="store_true", help="保留脚本内置的请求间隔与全局限速")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--child", choices=sorted(FETCHERS), help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    for key, value in DEFAULT_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    vids = [str(10000 + i) for i in range(args.count)]
+    if args.child:
+        # 子进程：只运行一个抓取脚本，结果写入父进程指定的文件
+        _write_json(args.child_output, measure(args.child, vids, args.keep_sleeps))
+        return
+
+    overrides = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    server, base_url, stats = start_server(**overrides)
+    # 必须在导入抓取脚本之前设置，jd_client 在导入时读取
+    os.environ["JD_API_BASE"] = base_url
+    os.environ["JD_SHOP_BASE"] = base_url
+    if not args.keep_sleeps:
+        os.environ["JD_MAX_RPS"] = "0"   # rate_limit 在导入时读取，<= 0 表示不限速
+    print(f"模拟服务: {base_url}", flush=True)
+
+    results = []
+    try:
+        for name in args.fetchers:
+            print(f"\n===== {name} =====", flush=True)
+            results.append(bench_one(name, args.count, stats, args.keep_sleeps))
+    finally:
+        server.shutdown()
+
+    print("\n===== 结果 =====")
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['fetcher']:<22} 跳过（{r['skipped']}）")
+            continue
+        print(f"{r['fetcher']:<22} {r['requests']:>6} req  {r['throughput_rps']:>8} req/s  "
+              f"p50 {r['p50_ms']:>8}ms  p95 {r['p95_ms']:>8}ms  p99 {r['p99_ms']:>8}ms  "
+              f"cpu {r['cpu_seconds']:>6}s  rss {r['max_rss_mb']:>7}MB  {r['server_status']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"config": overrides, "count": args.count, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+离线数据路径压测：用 gen_dataset 生成不同规模的合成数据，逐阶段统计耗时与内存，不访问网络
+每个阶段在独立的子进程中运行（spawn），内存峰值互不影响；多个规模对比得到伸缩曲线，
+耗时增长明显快于数据量（指数 > SUPERLINEAR_EXPONENT）的阶段会被标出
+
+阶段:
+    shop_load          ShopTable.load_json：解析 shop_info.json 并计算状态
+    shop_import        ShopStore.import_json：全量导入 SQLite
+    shop_export        ShopStore.export_json：导出 shop_info.json
+    sync_merge         sync_vids.sync_stage：店铺状态全部命中缓存时的新库合并 + 保存
+    clean_full         clean_vid.clean_stage：全量清洗分类文件
+    clean_incremental  clean_vid.clean_stage：输入未变化时的增量运行
+
+用法:
+    python bench/bench_offline.py --sizes 10000 100000 1000000
+    python bench/bench_offline.py --sizes 100000 --stages clean_full clean_incremental --output bench_offline.json
+    python bench/bench_offline.py --sizes 10000000 --extra-scale 0.1 --keep-data /tmp/ds
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gen_dataset import DEFAULT_CONFIG, generate
+
+SUPERLINEAR_EXPONENT = 1.3   # 伸缩指数超过此值时提示可能存在超线性复杂度
+
+
+def stage_shop_load():
+    from shop_table import ShopTable
+    table = ShopTable.load_json("shop_info.json")
+    return {"records": len(table), "valid": len(table.valid_vids())}
+
+
+def stage_shop_import():
+    from shop_store import ShopStore
+    if os.path.exists("shop_info.db"):
+        os.remove("shop_info.db")
+    with ShopStore("shop_info.db") as store:
+        return {"records": store.import_json("shop_info.json")}
+
+
+def stage_shop_export():
+    from shop_store import ShopStore
+    with ShopStore("shop_info.db") as store:
+        store.export_json("shop_info.export.json")
+        return {"records": store.count()}
+
+
+def stage_sync_merge():
+    import sync_vids
+    from shop_store import ShopStore
+    from vidset import VidSet
+    store = ShopStore("shop_info.db")
+    # 店铺状态全部视为刚查询过，遍历过程全部命中缓存、不发请求
+    with store.conn:
+        store.conn.execute("UPDATE shops SET checked_at = ?", (time.time(),))
+    metrics = sync_vids.new_metrics()
+    sync_vids.MAX_RUNTIME_MINS = 24 * 60
+    try:
+        sync_vids.migrate_new_layout()
+        old_vids = VidSet.load(sync_vids.OLD_FILE)
+        new_vids = VidSet.load(sync_vids.NEW_DATA)
+        before = len(new_vids)
+        next_index = asyncio.run(sync_vids.sync_stage(None, store, None, old_vids, new_vids, metrics))
+        sync_vids.save_outputs(old_vids, new_vids, next_index, metrics)
+    finally:
+        store.close()
+    return {"old": len(old_vids), "added": len(new_vids) - before, "queried": metrics.counters.get("queried", 0)}
+
+
+def _clean(incremental):
+    import clean_vid
+    from shop_table import ShopTable
+    if not incremental and os.path.exists(clean_vid.STATE_FILE):
+        os.remove(clean_vid.STATE_FILE)
+    valid_vids = ShopTable.load_json("shop_info.json").valid_vids()
+    metrics = clean_vid.new_metrics()
+    clean_vid.clean_stage(valid_vids, metrics)
+    return {key: metrics.counters[key] for key in sorted(metrics.counters)}
+
+
+def stage_clean_full():
+    return _clean(incremental=False)
+
+
+def stage_clean_incremental():
+    return _clean(incremental=True)
+
+
+STAGES = {
+    "shop_load": stage_shop_load,
+    "shop_import": stage_shop_import,
+    "shop_export": stage_shop_export,
+    "sync_merge": stage_sync_merge,
+    "clean_full": stage_clean_full,
+    "clean_incremental": stage_clean_incremental,
+}
+
+
+def _child(name, data_dir, use_tracemalloc, conn):
+    """子进程：在数据目录中运行单个阶段，回传耗时与内存"""
+    os.chdir(data_dir)
+    sys.path.insert(0, ROOT)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if use_tracemalloc:
+        tracemalloc.start()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    try:
+        # 阶段内部的逐条日志不计入结果，也不刷屏
+        with contextlib.redirect_stdout(io.StringIO()):
+            detail = STAGES[name]()
+        error = None
+    except Exception as e:
+        detail, error = None, f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    result = {
+        "stage": name,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round((usage_after.ru_utime - usage_before.ru_utime)
+                             + (usage_after.ru_stime - usage_before.ru_stime), 3),
+        # Linux 下 ru_maxrss 单位为 KB；delta 为阶段运行期间新增的峰值
+        "peak_rss_mb": round(usage_after.ru_maxrss / 1024, 1),
+        "rss_delta_mb": round((usage_after.ru_maxrss - base_rss) / 1024, 1),
+        "children_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "detail": detail,
+    }
+    if use_tracemalloc:
+        result["py_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    if error:
+        result["error"] = error
+    conn.send(result)
+    conn.close()
+
+
+def run_stage(name, data_dir, use_tracemalloc=False):
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(name, data_dir, use_tracemalloc, child))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {"stage": name, "error": f"子进程异常退出 (exitcode {proc.exitcode})"}
+    proc.join()
+    return result
+
+
+def _exponents(results, sizes):
+    """相邻规模之间的伸缩指数 log(t2/t1) / log(n2/n1)，1 表示线性"""
+    exponents = {}
+    for name in {r["stage"] for r in results}:
+        times = {r["size"]: r.get("wall_seconds") for r in results if r["stage"] == name}
+        values = []
+        for a, b in zip(sizes, sizes[1:]):
+            ta, tb = times.get(a), times.get(b)
+            # 太快的阶段计时噪声大，不参与判断
+            if ta and tb and ta >= 0.05 and b > a:
+                values.append(round(math.log(tb / ta) / math.log(b / a), 2))
+        exponents[name] = values
+    return exponents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线数据路径压测（合成数据，不访问网络）")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000, 1000000], help="旧库 VID 数量")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES),
+                        help="要运行的阶段（按固定顺序执行，后面的阶段依赖前面生成的文件）")
+    parser.add_argument("--tracemalloc", action="store_true", help="额外统计 Python 堆峰值（耗时会明显变长）")
+    parser.add_argument("--keep-data", help="把各规模的数据集保留在此目录下（默认使用临时目录并删除）")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    for key, value in DEFAULT_CONFIG.items():
+        if key != "vids":
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG if key != "vids"}
+    stages = [name for name in STAGES if name in args.stages]
+    sizes = sorted(args.sizes)
+    base_dir = args.keep_data or tempfile.mkdtemp(prefix="bench_offline_")
+    results = []
+    try:
+        for size in sizes:
+            data_dir = os.path.join(base_dir, f"vids_{size}")
+            shutil.rmtree(data_dir, ignore_errors=True)
+            print(f"\n===== {size} 个 VID =====", flush=True)
+            start = time.perf_counter()
+            counts = generate(data_dir, vids=size, **config)
+            print(f"数据集已生成 ({time.perf_counter() - start:.1f}s): {counts}", flush=True)
+            for name in stages:
+                result = run_stage(name, data_dir, args.tracemalloc)
+                result["size"] = size
+                results.append(result)
+                if "error" in result:
+                    print(f"{name:<18} 失败: {result['error']}", flush=True)
+                    continue
+                heap = f"  heap {result['py_heap_peak_mb']:>7}MB" if "py_heap_peak_mb" in result else ""
+                print(f"{name:<18} {result['wall_seconds']:>8}s  cpu {result['cpu_seconds']:>8}s  "
+                      f"rss {result['peak_rss_mb']:>7}MB (+{result['rss_delta_mb']}){heap}  {result['detail']}",
+                      flush=True)
+    finally:
+        if not args.keep_data:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    exponents = _exponents(results, sizes)
+    if len(sizes) > 1:
+        print("\n===== 伸缩指数（1 为线性） =====")
+        for name in stages:
+            values = exponents.get(name, [])
+            flag = "  ⚠️ 可能超线性" if any(v > SUPERLINEAR_EXPONENT for v in values) else ""
+            print(f"{name:<18} {values}{flag}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"config": config, "sizes": sizes, "results": results, "exponents": exponents},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+生成离线压测用的合成数据集（不访问网络），目录结构与仓库一致:
+    old_vid.json / new_vid.json / shop_info.json / oldvid/*.json
+- 旧库 VID 递增且不重复；shop_info 覆盖全部旧库 VID 与部分分类文件独有的 VID
+- 店铺状态按比例生成：已退店 / 无效 / 信息缺失（NoName）/ 正常
+- 分类文件参照真实数据的重叠关系：部分完全包含旧库、部分带大量旧库外的 VID，sjk_vid_dou 为整数数组
+- new_vid.json 为旧库前 synced_ratio 部分中的有效 VID，模拟同步进行到一半
+
+用法:
+    python bench/gen_dataset.py /tmp/ds --vids 1000000
+    python bench/gen_dataset.py /tmp/ds --vids 100000 --retired-ratio 0.3 --categories 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vidarray import format_id_array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_CONFIG = {
+    "vids": 100000,           # 旧库 VID 数量
+    "retired_ratio": 0.2,     # 已退店比例
+    "invalid_ratio": 0.02,    # 无效店铺比例
+    "unknown_ratio": 0.05,    # 信息缺失（待查询）比例
+    "synced_ratio": 0.5,      # new_vid.json 已同步到旧库的哪个位置
+    "extra_shop_ratio": 0.5,  # 旧库外的分类 VID 中有店铺信息的比例
+    "categories": 5,          # 分类文件数量
+    "extra_scale": 1.0,       # 分类文件中旧库外 VID 数量的缩放（数据量过大时调小）
+    "seed": 1,
+}
+
+# (文件名, 包含旧库 VID 的比例, 旧库外 VID 数量 / 旧库大小, 是否为字符串)，参照真实数据
+CATEGORY_SHAPES = (
+    ("sjk_vid_special", 1.0, 0.0, True),
+    ("sjk_vid_special_2", 0.99, 0.58, True),
+    ("sjk_vid_nai_normal", 0.82, 4.3, True),
+    ("sjk_vid_nai_special", 0.57, 0.0, True),
+    ("sjk_vid_dou", 0.02, 0.01, False),
+)
+
+MAX_GAP = 40   # 相邻 VID 的最大间隔
+_BUCKET_CODES = (1, 2, 3, 0)
+
+
+def _category_shapes(count, rng):
+    """前 5 个沿用真实形态，超出部分随机生成"""
+    shapes = list(CATEGORY_SHAPES[:count])
+    for i in range(len(shapes), count):
+        shapes.append((f"sjk_vid_cat_{i}", rng.uniform(0.05, 1.0), rng.uniform(0.0, 1.0), True))
+    return shapes
+
+
+def _unique_ids(total, rng):
+    """total 个递增且不重复的 VID"""
+    if np is not None:
+        gaps = np.random.default_rng(rng.randrange(2 ** 32)).integers(1, MAX_GAP, size=total, dtype=np.uint64)
+        return np.cumsum(gaps) + np.uint64(10000)
+    ids, value = array('Q'), 10000
+    for _ in range(total):
+        value += rng.randrange(1, MAX_GAP)
+        ids.append(value)
+    return ids
+
+
+def _split(ids, n, rng):
+    """把 ids 随机分成两部分：n 个（保持递增）与其余（保持递增）"""
+    if np is not None:
+        mask = np.zeros(len(ids), dtype=bool)
+        mask[np.random.default_rng(rng.randrange(2 ** 32)).choice(len(ids), size=n, replace=False)] = True
+        return ids[mask], ids[~mask]
+    chosen = set(rng.sample(range(len(ids)), n))
+    picked = array('Q', (v for i, v in enumerate(ids) if i in chosen))
+    rest = array('Q', (v for i, v in enumerate(ids) if i not in chosen))
+    return picked, rest
+
+
+def _sample(ids, n, rng):
+    """从 ids 中随机取 n 个（保持原顺序）"""
+    n = min(n, len(ids))
+    if n == len(ids):
+        return ids
+    return _split(ids, n, rng)[0]
+
+
+def _concat(a, b):
+    if np is not None:
+        return np.sort(np.concatenate([a, b]))
+    return array('Q', sorted(a + b))
+
+
+def _statuses(n, config, rng):
+    """每个店铺的状态编码：0 正常 1 已退店 2 无效 3 信息缺失"""
+    bounds = (config["retired_ratio"], config["retired_ratio"] + config["invalid_ratio"],
+              config["retired_ratio"] + config["invalid_ratio"] + config["unknown_ratio"])
+    # 落在第 i 个区间的取 _BUCKET_CODES[i]，最后一个区间为正常店铺
+    if np is not None:
+        r = np.random.default_rng(rng.randrange(2 ** 32)).random(n)
+        return np.asarray(_BUCKET_CODES, dtype=np.uint8)[np.searchsorted(np.asarray(bounds), r, side='right')]
+    return bytes(_BUCKET_CODES[sum(x >= b for b in bounds)] for x in (rng.random() for _ in range(n)))
+
+
+def _shop_entry(vid, code):
+    if code == 3:
+        shop_id, name = "", "NoName"
+    else:
+        shop_id = str(vid * 3 + 7)
+        name = ("模拟店铺", "模拟店铺(已退店)", "无效店铺")[code]
+        if code != 2:
+            name = f"{name[:4]}{vid}{name[4:]}"
+    return (f'    "{vid}": {{\n        "shopId": "{shop_id}",\n        "shopName": "{name}"\n    }}')
+
+
+def _write_shop_info(path, vids, codes, chunk=100000):
+    """分块写出，结果与 json.dumps(indent=4, ensure_ascii=False) 一致"""
+    values = vids.tolist()
+    codes = list(codes)
+    with open(path, 'w', encoding='utf-8') as f:
+        if not values:
+            f.write('{}')
+            return
+        f.write('{\n')
+        for start in range(0, len(values), chunk):
+            if start:
+                f.write(',\n')
+            f.write(',\n'.join(_shop_entry(v, c) for v, c in zip(values[start:start + chunk],
+                                                                 codes[start:start + chunk])))
+        f.write('\n}')
+
+
+def _write_ids(path, ids, quoted=True):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(format_id_array(ids, quoted=quoted, indent=4))
+
+
+def generate(out_dir, **overrides):
+    """生成数据集，返回各文件的条数统计（同时写入 out_dir/dataset.json）"""
+    config = dict(DEFAULT_CONFIG, **overrides)
+    rng = random.Random(config["seed"])
+    n = config["vids"]
+    shapes = _category_shapes(config["categories"], rng)
+    extra_total = int(n * config["extra_scale"] * max((s[2] for s in shapes), default=0))
+
+    os.makedirs(os.path.join(out_dir, "oldvid"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "newvid"), exist_ok=True)
+
+    # 1. 旧库与旧库外 VID 交错分布在同一数值区间
+    old_ids, extra_ids = _split(_unique_ids(n + extra_total, rng), n, rng)
+    _write_ids(os.path.join(out_dir, "old_vid.json"), old_ids)
+
+    # 2. 店铺信息：旧库全部 + 部分旧库外 VID
+    shop_extra = _sample(extra_ids, int(len(extra_ids) * config["extra_shop_ratio"]), rng)
+    shop_ids = _concat(old_ids, shop_extra)
+    codes = _statuses(len(shop_ids), config, rng)
+    _write_shop_info(os.path.join(out_dir, "shop_info.json"), shop_ids, codes)
+
+    # 3. 新库：已同步前缀中的有效店铺（与 sync_vids 的缓存判断一致：正常或无效）
+    synced = int(n * config["synced_ratio"])
+    if np is not None:
+        old_codes = codes[np.searchsorted(shop_ids, old_ids[:synced])]
+        new_ids = old_ids[:synced][(old_codes == 0) | (old_codes == 2)]
+    else:
+        code_of = dict(zip(shop_ids, codes))
+        new_ids = array('Q', (v for v in old_ids[:synced] if code_of[v] in (0, 2)))
+    _write_ids(os.path.join(out_dir, "new_vid.json"), new_ids)
+
+    # 4. 分类文件
+    counts = {"old_vid": len(old_ids), "new_vid": len(new_ids), "shop_info": len(shop_ids), "categories": {}}
+    for name, old_ratio, extra_ratio, quoted in shapes:
+        members = _concat(_sample(old_ids, int(n * old_ratio), rng),
+                          _sample(extra_ids, int(n * config["extra_scale"] * extra_ratio), rng))
+        _write_ids(os.path.join(out_dir, "oldvid", f"{name}.json"), members, quoted=quoted)
+        counts["categories"][name] = len(members)
+
+    with open(os.path.join(out_dir, "dataset.json"), 'w', encoding='utf-8') as f:
+        json.dump({"config": config, "counts": counts}, f, ensure_ascii=False, indent=2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成离线压测用的合成数据集")
+    parser.add_argument("out_dir")
+    for key, value in DEFAULT_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    counts = generate(args.out_dir, **{key: getattr(args, key) for key in DEFAULT_CONFIG})
+    print(json.dumps(counts, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
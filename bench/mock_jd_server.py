@@ -0,0 +1,178 @@
+"""
+本地模拟京东接口，用于离线压测各抓取脚本
+实现 whx_getMShopOutlineInfo / whx_getShopHomeActivityInfo 以及 /shop/home 页面
+可配置延迟、错误率、403/429 注入和响应形态（含 isvUrl/token 命中）
+
+用法:
+    python bench/mock_jd_server.py --port 8808 --latency-ms 80 --rate-403 0.01
+    JD_API_BASE=http://127.0.0.1:8808 JD_SHOP_BASE=http://127.0.0.1:8808 python getshopinfo.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TARGET_PATTERN = "2PAAf74aG3D61qvfKUM5dxUssJQ9"
+
+DEFAULT_CONFIG = {
+    "latency_ms": 50,          # 基础响应延迟
+    "jitter_ms": 20,           # 延迟随机抖动（均匀分布 ±）
+    "error_rate": 0.0,         # 返回 500 的概率
+    "rate_403": 0.0,           # 返回 403 的概率
+    "rate_429": 0.0,           # 返回 429（带 Retry-After）的概率
+    "retry_after": 2,          # 429 的 Retry-After 秒数
+    "retired_ratio": 0.2,      # 店铺已退店比例
+    "missing_ratio": 0.1,      # 查不到 shopInfo 的比例
+    "hit_ratio": 0.05,         # 活动接口返回目标 isvUrl 的比例
+    "biz_fail_ratio": 0.0,     # 活动接口返回业务失败 (code != "0") 的比例
+}
+
+
+def _bucket(vid, salt):
+    """按 VID 得到稳定的 [0, 1) 值，同一 VID 每次返回相同的店铺形态"""
+    h = hashlib.md5(f"{salt}:{vid}".encode()).hexdigest()
+    return int(h[:8], 16) / 0x100000000
+
+
+def outline_response(vid, config):
+    b = _bucket(vid, "outline")
+    if b < config["missing_ratio"]:
+        return {"code": "0", "data": {}}
+    name = f"模拟店铺{vid}"
+    if b < config["missing_ratio"] + config["retired_ratio"]:
+        name += "(已退店)"
+    return {"code": "0", "data": {"shopInfo": {"shopId": int(vid) * 10 + 1 if str(vid).isdigit() else 1, "shopName": name}}}
+
+
+def activity_response(vid, config):
+    if random.random() < config["biz_fail_ratio"]:
+        return {"code": "1", "msg": "风控拦截"}
+    isv_url = ""
+    if _bucket(vid, "activity") < config["hit_ratio"]:
+        token = hashlib.sha1(f"token:{vid}".encode()).hexdigest()[:24]
+        isv_url = f"https://lzkj-isv.isvjcloud.com/sign/{TARGET_PATTERN}/index?venderId={vid}&token={token}"
+    return {"code": "0", "result": {"signStatus": {"isvUrl": isv_url}}}
+
+
+class MockStats:
+    """服务端统计：按 functionId 与状态码计数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, function_id, status):
+        with self.lock:
+            key = f"{function_id}:{status}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+def make_handler(config, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # 支持 keep-alive
+        disable_nagle_algorithm = True  # 头部与正文分两次写出，避免 Nagle + 延迟确认带来的 40ms 停顿
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload=None, content_type="application/json", headers=None):
+            body = b"" if payload is None else (
+                payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _params(self):
+            parsed = urllib.parse.urlparse(self.path)
+            params = dict(urllib.parse.parse_qsl(parsed.query))
+            if self.command == "POST":
+                length = int(self.headers.get("Content-Length") or 0)
+                params.update(urllib.parse.parse_qsl(self.rfile.read(length).decode("utf-8")))
+            return parsed.path, params
+
+        def _handle(self):
+            path, params = self._params()
+
+            if path.startswith("/shop/home"):
+                html = b"<!doctype html><html><head><title>mock shop</title></head><body>mock</body></html>"
+                self._send(200, html, content_type="text/html; charset=utf-8")
+                return
+            if path != "/client.action":
+                self._send(404, {"code": "404"})
+                return
+
+            function_id = params.get("functionId", "")
+            try:
+                vid = json.loads(params.get("body", "{}")).get("venderId", "")
+            except ValueError:
+                vid = ""
+
+            delay = config["latency_ms"] + random.uniform(-config["jitter_ms"], config["jitter_ms"])
+            time.sleep(max(delay, 0) / 1000)
+
+            r = random.random()
+            if r < config["rate_403"]:
+                status, payload, headers = 403, None, None
+            elif r < config["rate_403"] + config["rate_429"]:
+                status, payload, headers = 429, None, {"Retry-After": str(config["retry_after"])}
+            elif r < config["rate_403"] + config["rate_429"] + config["error_rate"]:
+                status, payload, headers = 500, {"code": "500"}, None
+            elif function_id == "whx_getMShopOutlineInfo":
+                status, payload, headers = 200, outline_response(vid, config), None
+            elif function_id == "whx_getShopHomeActivityInfo":
+                status, payload, headers = 200, activity_response(vid, config), None
+            else:
+                status, payload, headers = 200, {"code": "3", "msg": "unknown functionId"}, None
+
+            stats.add(function_id, status)
+            self._send(status, payload, headers=headers)
+
+        do_GET = _handle
+        do_POST = _handle
+
+    return Handler
+
+
+def start_server(host="127.0.0.1", port=0, **overrides):
+    """在后台线程启动模拟服务，返回 (server, base_url, stats)；port=0 时自动分配端口"""
+    config = dict(DEFAULT_CONFIG, **overrides)
+    stats = MockStats()
+    server = ThreadingHTTPServer((host, port), make_handler(config, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}", stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟京东店铺接口")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    for key, value in DEFAULT_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    overrides = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    server, base_url, stats = start_server(args.host, args.port, **overrides)
+    print(f"模拟服务已启动: {base_url}", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"请求统计: {stats.snapshot()}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import time
+
+# ================= 配置区 =================
+CHECKPOINT_EVERY = 20        # 每获得多少条接口结果保存一次
+CHECKPOINT_SECONDS = 60      # 距上次保存超过多少秒也保存一次
+# =========================================
+
+
+class Checkpointer:
+    """
+    长循环的定期保存：每 every 条结果或每 seconds 秒调用一次 save(state)
+    save 负责原子写出（见 json_io.write_atomic），运行被中断时最多丢失一个周期的结果
+    用法:
+        checkpoint = Checkpointer(lambda i: save_outputs(i))
+        checkpoint.tick(next_index)       # 每条结果后调用
+        checkpoint.flush()                # 结束时（含异常路径）调用
+    """
+
+    def __init__(self, save, every=CHECKPOINT_EVERY, seconds=CHECKPOINT_SECONDS):
+        self.save = save
+        self.every = every
+        self.seconds = seconds
+        self.state = None
+        self.pending = 0
+        self.saves = 0
+        self._last = time.monotonic()
+
+    def tick(self, state=None, n=1):
+        """记录最新进度；n 为本次新增的结果数（只推进进度、没有新结果时传 0）"""
+        self.state = state
+        self.pending += n
+        if self.pending >= self.every or (self.pending and time.monotonic() - self._last >= self.seconds):
+            self.flush()
+
+    def flush(self, force=False):
+        """有未保存的结果（或 force）时立即保存"""
+        if not self.pending and not force:
+            return False
+        self.save(self.state)
+        self.pending = 0
+        self.saves += 1
+        self._last = time.monotonic()
+        return True
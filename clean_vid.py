@@ -1,65 +1,160 @@
-import json
+import hashlib
 import os
+from shop_store import ShopStore, SHOP_DB, readable_shop_data
+from shop_table import ShopTable
+from metrics import RunMetrics
+from json_io import load_json, dump_json
+from vid_index import VidIndex
+from run_log import RunLogger
+
+# 配置参数
+STATE_FILE = 'clean_state.json'  # 增量状态：输入/输出文件摘要 + 上次的有效 VID 快照
+INCREMENTAL = True               # False 时强制全量重建
+PARALLEL = True                  # 建索引时多个分类文件并行解析（进程池）
+MAX_WORKERS = os.cpu_count() or 1
+
+# 与其他脚本共用日志缓冲区，在流水线中运行时输出顺序与各阶段一致
+log = RunLogger("%Y-%m-%d %H:%M:%S", icons=False)
+
+def load_state(path):
+    """读取增量状态，不存在或损坏时返回空状态"""
+    try:
+        state = load_json(path)
+    except (OSError, ValueError):
+        return {"files": {}, "valid": None}
+    if not isinstance(state, dict):
+        return {"files": {}, "valid": None}
+    state.setdefault("files", {})
+    state.setdefault("valid", None)
+    return state
+
+def save_state(path, files, valid_vids):
+    dump_json(path, {"files": files, "valid": sorted(valid_vids)})
+
+def hash_file(path, chunk_size=1 << 20):
+    """分块计算文件 sha1，与 shop_store.file_digest 结果一致"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def new_metrics():
+    return RunMetrics("clean_vid", limits={"INCREMENTAL": INCREMENTAL, "PARALLEL": PARALLEL, "MAX_WORKERS": MAX_WORKERS})
 
 def clean_vid_files():
-    # 配置路径
-    shop_info_path = 'shop_info.json'
+    shop_info_path = readable_shop_data()
+
+    # 读取店铺数据：只需要有效性判断，载入紧凑店铺表即可
+    # 数据库与 shop_info 同步（或没有 shop_info）时直接读库；有变化时直接解析，不必整表导入数据库
+    # 清洗只读取店铺数据，不做分片迁移（迁移由写入店铺数据的脚本执行）
+    has_json, has_db = os.path.exists(shop_info_path), os.path.exists(SHOP_DB)
+    if not has_json and not has_db:
+        log(f"错误：找不到 {shop_info_path}", "ERROR")
+        return
+    metrics = new_metrics()
+    with metrics.timed("json_load"):
+        table = None
+        if has_db:
+            with ShopStore(SHOP_DB) as store:
+                if not has_json or store.in_sync_with(shop_info_path):
+                    table = store.load_table()
+        if table is None:
+            table = ShopTable.load_json(shop_info_path)
+        # 状态在载入时算好一次：排除“退店”与“无效”
+        valid_vids = table.valid_vids()
+    log(f"店铺 {len(table)} 条，有效 {len(valid_vids)} 条")
+
+    clean_stage(valid_vids, metrics)
+    log(f"运行报告: {metrics.write()}")
+
+def clean_stage(valid_vids, metrics):
+    """按有效 VID 集合过滤 oldvid/ 下的分类文件，写出到 newvid/ 并保存增量状态"""
     old_folder = 'oldvid'
     new_folder = 'newvid'
 
     # 1. 确保输出目录存在
     if not os.path.exists(new_folder):
         os.makedirs(new_folder)
-        print(f"创建目录: {new_folder}")
+        log(f"创建目录: {new_folder}")
 
-    # 2. 读取 shop_info.json
-    try:
-        with open(shop_info_path, 'r', encoding='utf-8') as f:
-            shop_data = json.load(f)
-    except FileNotFoundError:
-        print(f"错误：找不到 {shop_info_path}")
-        return
+    # 2. 对比上次快照，找出有效性翻转的 VID
+    state = load_state(STATE_FILE) if INCREMENTAL else {"files": {}, "valid": None}
+    if state["valid"] is None:
+        flipped = None  # 没有快照，全部重算
+    else:
+        flipped = valid_vids.symmetric_difference(state["valid"])
+        log(f"店铺状态变化的 VID: {len(flipped)} 个")
 
-    # 3. 定义过滤函数
-    def is_valid_vid(vid):
-        vid_str = str(vid)
-        if vid_str in shop_data:
-            shop_name = shop_data[vid_str].get('shopName', '')
-            # 检查是否包含“退店”或“无效”
-            if "退店" not in shop_name and "无效" not in shop_name:
-                return True
-        return False
-
-    # 4. 遍历 oldvid 文件夹
-    files_processed = 0
-    for filename in os.listdir(old_folder):
-        if filename.endswith('.json'):
+    # 3. 按输入摘要决定每个文件是否需要处理
+    # 输出文件的摘要也要与快照一致：newvid/ 被其他工作流（或手动）改写过时，快照已不代表现有输出，必须重算
+    files_skipped = 0
+    file_states = {}
+    pending = {}
+    with metrics.timed("scan_inputs"):
+        for filename in sorted(os.listdir(old_folder)):
+            if not filename.endswith('.json'):
+                continue
             old_file_path = os.path.join(old_folder, filename)
             new_file_path = os.path.join(new_folder, filename)
+            digest = hash_file(old_file_path)
+            previous = state["files"].get(filename, {})
+            output = hash_file(new_file_path) if os.path.exists(new_file_path) else None
+            file_states[filename] = {"digest": digest, "output": output}
 
+            unchanged = (flipped is not None
+                         and previous.get("digest") == digest
+                         and output is not None
+                         and previous.get("output") == output)
+            if flipped is not None and previous.get("digest") == digest and not unchanged:
+                metrics.count("files_output_drift")
+            if unchanged and not flipped:
+                # 输入未变且没有状态翻转的 VID，无需读取
+                files_skipped += 1
+                continue
+            pending[os.path.splitext(filename)[0]] = (filename, old_file_path, new_file_path, unchanged)
+
+    # 4. 待处理的分类合并为跨分类索引，有效性与状态翻转对每个唯一 VID 只判断一次
+    # 各文件（多文件时并行）解析后逐个并入索引，内存只保留紧凑的位置数组
+    with metrics.timed("build_index"):
+        index = VidIndex([(name, task[1]) for name, task in pending.items()],
+                         workers=MAX_WORKERS if PARALLEL else 1)
+        valid = index.lookup(valid_vids)
+        flipped_mask = index.lookup(flipped) if flipped else None
+    if index.categories:
+        log(f"索引 {len(index.categories)} 个分类，共 {index.entries()} 条，唯一 VID {len(index)} 个")
+
+    # 5. 由索引导出各分类文件
+    files_processed = 0
+    with metrics.timed("filter_write"):
+        for name, (filename, _, new_file_path, unchanged) in pending.items():
+            if name in index.errors:
+                # 出错的文件不记录摘要，下次重新处理
+                file_states.pop(filename, None)
+                metrics.count("files_failed")
+                log(f"处理文件 {filename} 时出错: {index.errors[name]}", "WARN")
+                continue
+            if unchanged and not index.any_in(name, flipped_mask):
+                files_skipped += 1
+                continue
             try:
-                # 读取旧的 vid 列表
-                with open(old_file_path, 'r', encoding='utf-8') as f:
-                    vids = json.load(f)
-                
-                if not isinstance(vids, list):
-                    print(f"跳过文件 {filename}：数据格式不是数组")
-                    continue
-
-                # 过滤无效 vid
-                cleaned_vids = [vid for vid in vids if is_valid_vid(vid)]
-
-                # 写入新文件（覆盖写入）
-                with open(new_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(cleaned_vids, f, ensure_ascii=False, indent=4)
-                
-                files_processed += 1
-                print(f"已处理: {filename} ({len(vids)} -> {len(cleaned_vids)})")
-
-            except Exception as e:
-                print(f"处理文件 {filename} 时出错: {e}")
-
-    print(f"\n任务完成！共处理文件数: {files_processed}")
+                total, kept, written = index.write_filtered(name, valid, new_file_path)
+            except OSError as e:
+                file_states.pop(filename, None)
+                metrics.count("files_failed")
+                log(f"处理文件 {filename} 时出错: {e}", "WARN")
+                continue
+            file_states[filename]["output"] = hash_file(new_file_path)
+            files_processed += 1
+            if not written:
+                metrics.count("files_unchanged")
+            log(f"已处理: {filename} ({total} -> {kept})" + ("" if written else "，结果未变化，未重写"))
+
+    with metrics.timed("json_save"):
+        save_state(STATE_FILE, file_states, valid_vids)
+    metrics.count("files_processed", files_processed)
+    metrics.count("files_skipped", files_skipped)
+    log(f"任务完成！共处理文件数: {files_processed}，未变化跳过: {files_skipped}")
 
 if __name__ == "__main__":
     clean_vid_files()
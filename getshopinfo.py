@@ -1,144 +1,160 @@
-import json
 import asyncio
 import time
 import os
-import httpx
-import urllib.parse
 import sys
+from jd_client import AsyncJDClient, normalize_shop
+from shop_store import ShopStore, SHOP_DB, SHOP_DATA, migrate_layout
+from metrics import RunMetrics
+from rate_limit import RateLimiter
+from checkpoint import Checkpointer
+from run_log import RunLogger
 
 # --- 配置参数 ---
 MAX_QUERIES = 100          # 每次运行最多查询的 vid 数量
 MAX_RUNTIME_SEC = 1800     # 最长运行时间（秒），例如 30 分钟
 MAX_403_ERRORS = 5         # 累计遇到多少次 403 错误后停止
+EXPORT_JSON = True         # 运行结束后把数据库导出 shop_info（工作流提交用）
 # ----------------
 
-def log(message):
-    current_time = time.strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{current_time}] {message}", flush=True)
+# 逐条查询进度为 DEBUG，查询结果合并汇总；403 等警告立即写出（见 run_log.py）
+log = RunLogger("%Y-%m-%d %H:%M:%S", icons=False)
 
-async def get_ua():
-    return "Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1"
-
-async def getshopinfo(v_id, retrytimes=1, waitsecond=2, timeout=10):
+async def getshopinfo(client, v_id):
     """
     返回元组: (result_dict, status_code)
     """
-    ua = await get_ua()
-    headers = {
-        'accept': 'application/json, text/plain, */*',
-        'Origin': 'https://shop.m.jd.com/',
-        'Referer': 'https://shop.m.jd.com/',
-        'User-Agent': ua
-    }
-    body = {"venderId": str(v_id), "source": "m-shop"}
-    body_enc = urllib.parse.quote(json.dumps(body))
-    url = f"https://api.m.jd.com/client.action?functionId=whx_getMShopOutlineInfo&body={body_enc}&t={int(time.time()*1000)}&appid=shop_view"
-
     try:
-        async with httpx.AsyncClient(timeout=timeout, verify=False) as client:
-            response = await client.get(url, headers=headers)
-            if response.status_code == 200:
-                res_json = response.json()
-                shop_info = res_json.get("data", {}).get("shopInfo", {})
-                if shop_info and shop_info.get("shopId"):
-                    return {
-                        "shopId": str(shop_info.get("shopId", "") ) or "000",
-                        "shopName": shop_info.get("shopName", "") or "已退店"
-                    }, 200
-                return None, 200
-            return None, response.status_code
+        status, shop_info = await client.get_shop_outline(v_id)
+        if status == 200:
+            return normalize_shop(shop_info), 200
+        return None, status
     except Exception as e:
-        log(f"⚠️ Vender {v_id} 请求异常: {e}")
+        log(f"⚠️ Vender {v_id} 请求异常: {e}", "WARN")
         return None, 999 # 自定义异常码
 
-async def run_task():
-    start_time = time.time()
-    file_path = 'shop_info.json'
-    
-    if not os.path.exists(file_path):
-        log("❌ 错误: shop_info.json 不存在")
-        return
+def new_metrics():
+    return RunMetrics("getshopinfo", limits={
+        "MAX_QUERIES": MAX_QUERIES, "MAX_RUNTIME_SEC": MAX_RUNTIME_SEC, "MAX_403_ERRORS": MAX_403_ERRORS})
 
-    # 加载数据
-    log("📂 正在加载 JSON 文件...")
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = "".join(c for c in f.read() if ord(c) >= 32 or c in "\n\r\t")
-            data = json.loads(content, strict=False)
+async def refresh_stage(client, store, limiter, metrics, checkpoint=None):
+    """
+    店铺刷新阶段：查询待查 VID 并逐条写入数据库
+    传入 checkpoint（checkpoint.Checkpointer）时每获得新店铺信息计数一次，由它定期导出 JSON
+    返回成功获取的店铺数
+    """
+    start_time = time.time()
 
-    v_keys = list(data.keys())
-    log(f"✅ 加载成功，共 {len(v_keys)} 条数据")
+    # 待查 VID 直接走状态索引，无需扫描全表；从未查询过的优先，未命中记录按指数间隔复查
+    pending = store.pending_vids(limit=MAX_QUERIES)
+    due, deferred = store.recheck_stats()
+    metrics.count("pending", len(pending))
+    metrics.count("recheck_deferred", deferred)
+    log(f"🗂️ 本次待查 {len(pending)} 条（到期复查 {due} 条，未到复查时间 {deferred} 条）")
 
     # 计数器
     query_count = 0        # 当前已发起的查询数
     success_count = 0      # 成功获取结果数
     error_403_count = 0    # 403 错误累计数
-    skip_count = 0
 
-    for v_key in v_keys:
+    for v_key in pending:
         # --- 停止条件判断 ---
-        
+
         # 1. 运行时间检查
         elapsed = time.time() - start_time
         if elapsed > MAX_RUNTIME_SEC:
             log(f"🛑 达到时间上限 ({int(elapsed)}s)，停止运行。")
+            metrics.count("stop_runtime")
+            break
+
+        # 1.1 服务端要求的退避超过剩余时间，等待也无意义
+        backoff = limiter.pending_delay()
+        if elapsed + backoff > MAX_RUNTIME_SEC:
+            log(f"🛑 限速退避 {int(backoff)}s 超出剩余运行时间，停止运行。")
+            metrics.count("stop_backoff")
             break
 
         # 2. 查询数量检查
         if query_count >= MAX_QUERIES:
             log(f"🛑 达到单次最大查询数 ({MAX_QUERIES})，停止运行。")
+            metrics.count("stop_max_queries")
             break
 
         # 3. 403 错误检查
         if error_403_count >= MAX_403_ERRORS:
             log(f"🛑 累计 403 错误达 {MAX_403_ERRORS} 次，疑似封禁，停止运行。")
+            metrics.count("stop_403")
             break
 
         # --- 逻辑处理 ---
-        item = data.get(v_key)
-        if not isinstance(item, dict):
-            data[v_key] = {"shopId": "", "shopName": "NoName"}
-            item = data[v_key]
-
-        if "vender" in item: del item["vender"]
-
-        s_id = item.get("shopId", "")
-        s_name = item.get("shopName", "")
-        
-        if not s_id or not s_name or s_name == "NoName":
-            query_count += 1
-            log(f"🔍 [{query_count}/{MAX_QUERIES}] 正在查询 {v_key}...")
-            
-            result, status = await getshopinfo(v_key)
-            
-            if status == 200:
-                if result:
-                    data[v_key].update(result)
-                    success_count += 1
-                    log(f"✨ 成功: {result['shopName']}")
-                else:
-                    log(f"⚠️ 未找到店铺信息: {v_key}")
-            elif status == 403:
-                error_403_count += 1
-                log(f"🚫 触发 403 Forbidden ({error_403_count}/{MAX_403_ERRORS})")
+        query_count += 1
+        metrics.count("queried")
+        log(f"🔍 [{query_count}/{MAX_QUERIES}] 正在查询 {v_key}...", "DEBUG")
+
+        result, status = await getshopinfo(client, v_key)
+
+        if status == 200:
+            if result:
+                store.upsert(v_key, result["shopId"], result["shopName"])
+                success_count += 1
+                metrics.count("success")
+                log(f"✨ 成功: {result['shopName']}", category="found")
+                if checkpoint:
+                    checkpoint.tick()
             else:
-                log(f"❓ 其他错误状态码: {status}")
-
-            await asyncio.sleep(5) # 频率限制
+                next_check_at = store.record_miss(v_key)
+                metrics.count("not_found")
+                log(f"⚠️ 未找到店铺信息: {v_key}，{time.strftime('%m-%d %H:%M', time.localtime(next_check_at))} 后复查", category="not_found")
+        elif status == 403:
+            error_403_count += 1
+            metrics.count("forbidden")
+            log(f"🚫 触发 403 Forbidden ({error_403_count}/{MAX_403_ERRORS})", "WARN")
         else:
-            skip_count += 1
-            if skip_count % 5000 == 0:
-                log(f"ℹ️ 已跳过 {skip_count} 条数据...")
-
-    # 保存数据
-    log(f"💾 正在保存进度...")
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-    
-    log(f"🎉 运行结束。查询: {query_count}, 成功: {success_count}, 403错误: {error_403_count}, 耗时: {int(time.time()-start_time)}s")
+            log(f"❓ 其他错误状态码: {status}", "WARN")
+            metrics.count("other_errors")
+
+    log.summarize()
+    log(f"🎉 查询结束。查询: {query_count}, 成功: {success_count}, 403错误: {error_403_count}, 耗时: {int(time.time()-start_time)}s")
+    return success_count
+
+async def run_task():
+    file_path = SHOP_DATA
+
+    migrate_layout(log)
+    if not os.path.exists(file_path) and not os.path.exists(SHOP_DB):
+        log(f"❌ 错误: {file_path} 不存在")
+        return
+
+    metrics = new_metrics()
+
+    # 加载数据：数据库与 JSON 一致时直接复用，否则从 JSON 重新导入
+    log("📂 正在加载店铺数据...")
+    with metrics.timed("json_load"):
+        store = ShopStore(SHOP_DB)
+        imported = store.sync_from_json(file_path)
+    if imported:
+        log(f"📥 {file_path} 有更新，已导入数据库")
+    log(f"✅ 加载成功，共 {store.count()} 条数据")
+
+    # 数据库已逐条写入；shop_info 定期原子导出（分片目录只重写改动过的分片），运行被中断时已查到的结果也能提交
+    def save_json(_):
+        log(f"💾 正在导出 {file_path}...")
+        with metrics.timed("json_save"):
+            store.export_json(file_path)
+        metrics.count("checkpoints")
+
+    checkpoint = Checkpointer(save_json) if EXPORT_JSON else None
+
+    # 整个运行周期共用一个连接池；请求节奏由全局限速器控制，不再固定 sleep
+    limiter = RateLimiter()
+    try:
+        async with AsyncJDClient(metrics=metrics, limiter=limiter) as client:
+            await refresh_stage(client, store, limiter, metrics, checkpoint)
+    finally:
+        if checkpoint:
+            checkpoint.flush()
+        store.close()
+
+    log(f"📈 运行报告: {metrics.write()}")
 
 if __name__ == "__main__":
     async def main():
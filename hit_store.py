@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from json_io import load_json, dump_json
+
+# ================= 配置区 =================
+HIT_DB = 'hits.db'
+HIT_JSON = 'hits.json'     # 导出给下游使用（工作流提交）
+# =========================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hits (
+    vid        TEXT PRIMARY KEY,
+    token      TEXT NOT NULL,
+    isv_url    TEXT NOT NULL,
+    source     TEXT,                       -- 最后一次命中的抓取脚本
+    first_seen REAL NOT NULL,              -- 首次命中时间（秒级时间戳）
+    last_seen  REAL NOT NULL,              -- 最近一次命中时间
+    changed_at REAL NOT NULL,              -- 最近一次活动变化（新出现 / token 变化 / 活动消失）
+    active     INTEGER NOT NULL DEFAULT 1  -- 最近一次查询是否仍有目标活动
+);
+CREATE INDEX IF NOT EXISTS idx_hits_last_seen ON hits(last_seen);
+CREATE INDEX IF NOT EXISTS idx_hits_changed ON hits(changed_at);
+CREATE TABLE IF NOT EXISTS hit_events (
+    id      INTEGER PRIMARY KEY,
+    vid     TEXT NOT NULL,
+    token   TEXT NOT NULL,
+    isv_url TEXT NOT NULL,
+    source  TEXT,
+    seen_at REAL NOT NULL,
+    UNIQUE(vid, token)                     -- 同一店铺的同一 token 只记一次
+);
+CREATE TABLE IF NOT EXISTS scans (
+    vid          TEXT PRIMARY KEY,
+    last_scanned REAL NOT NULL,            -- 最近一次成功查询时间
+    quiet_streak INTEGER NOT NULL DEFAULT 0  -- 连续无目标活动的次数，命中时清零
+);
+"""
+
+# record_hit 的返回值
+HIT_NEW = 'new'            # 首次命中
+HIT_CHANGED = 'changed'    # token 变化或活动重新出现
+HIT_SEEN = 'seen'          # 与上次相同
+
+
+class HitStore:
+    """
+    活动命中记录（SQLite），以 VID 为主键保存当前 token / 链接与首末次命中时间
+    hit_events 为只追加的历史，按 (vid, token) 去重
+    """
+
+    def __init__(self, path=HIT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    # ---------- 写入 ----------
+
+    def _record_scan(self, vid, seen_at, quiet):
+        self.conn.execute(
+            "INSERT INTO scans(vid, last_scanned, quiet_streak) VALUES(?, ?, ?) "
+            "ON CONFLICT(vid) DO UPDATE SET last_scanned = excluded.last_scanned, "
+            "quiet_streak = CASE WHEN ? THEN quiet_streak + 1 ELSE 0 END",
+            (vid, seen_at, int(quiet), quiet))
+
+    def record_hit(self, vid, isv_url, token, source=None, seen_at=None):
+        """记录一次命中，返回 HIT_NEW / HIT_CHANGED / HIT_SEEN"""
+        vid = str(vid)
+        seen_at = time.time() if seen_at is None else seen_at
+        row = self.conn.execute("SELECT token, active FROM hits WHERE vid = ?", (vid,)).fetchone()
+        if row is None:
+            result = HIT_NEW
+        elif row[0] != token or not row[1]:
+            result = HIT_CHANGED
+        else:
+            result = HIT_SEEN
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO hits(vid, token, isv_url, source, first_seen, last_seen, changed_at, active) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, 1) "
+                "ON CONFLICT(vid) DO UPDATE SET token = excluded.token, isv_url = excluded.isv_url, "
+                "source = excluded.source, last_seen = excluded.last_seen, active = 1, "
+                "changed_at = CASE WHEN ? THEN excluded.changed_at ELSE changed_at END",
+                (vid, token, isv_url, source, seen_at, seen_at, seen_at, result != HIT_SEEN))
+            self.conn.execute(
+                "INSERT OR IGNORE INTO hit_events(vid, token, isv_url, source, seen_at) VALUES(?, ?, ?, ?, ?)",
+                (vid, token, isv_url, source, seen_at))
+            self._record_scan(vid, seen_at, quiet=False)
+        return result
+
+    def record_no_activity(self, vid, seen_at=None):
+        """查询成功但没有目标活动；之前命中过的标记为失效，返回是否发生了变化"""
+        seen_at = time.time() if seen_at is None else seen_at
+        with self.conn:
+            cur = self.conn.execute(
+                "UPDATE hits SET active = 0, changed_at = ? WHERE vid = ? AND active = 1", (seen_at, str(vid)))
+            self._record_scan(str(vid), seen_at, quiet=True)
+        return cur.rowcount > 0
+
+    # ---------- 查询 ----------
+
+    def _rows(self, where, params):
+        sql = ("SELECT vid, token, isv_url, source, first_seen, last_seen, changed_at, active FROM hits "
+               f"WHERE {where} ORDER BY last_seen DESC")
+        return [{
+            "vid": vid, "token": token, "isvUrl": isv_url, "source": source,
+            "firstSeen": first_seen, "lastSeen": last_seen, "changedAt": changed_at, "active": bool(active),
+        } for vid, token, isv_url, source, first_seen, last_seen, changed_at, active in self.conn.execute(sql, params)]
+
+    def get(self, vid):
+        rows = self._rows("vid = ?", (str(vid),))
+        return rows[0] if rows else None
+
+    def recent_hits(self, hours):
+        """最近 hours 小时内命中过的店铺"""
+        return self._rows("last_seen >= ?", (time.time() - hours * 3600,))
+
+    def changed_since(self, hours):
+        """最近 hours 小时内活动发生变化的店铺（新出现、token 变化或活动消失）"""
+        return self._rows("changed_at >= ?", (time.time() - hours * 3600,))
+
+    def active_tokens(self):
+        """当前仍有效的去重 token 列表"""
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT token FROM hits WHERE active = 1 ORDER BY token")]
+
+    def priority_vids(self, hours, limit=None):
+        """
+        值得优先扫描的店铺：当前仍有目标活动的在前（最近命中的优先），
+        其后是最近 hours 小时内活动发生过变化的（最近变化的优先）
+        """
+        sql = ("SELECT vid FROM hits WHERE active = 1 OR changed_at >= ? "
+               "ORDER BY active DESC, CASE WHEN active THEN last_seen ELSE changed_at END DESC")
+        params = (time.time() - hours * 3600,)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    def dormant_vids(self, min_streak, within_hours):
+        """连续 min_streak 次以上无目标活动、且最近 within_hours 小时内扫描过的店铺"""
+        return {row[0] for row in self.conn.execute(
+            "SELECT vid FROM scans WHERE quiet_streak >= ? AND last_scanned >= ?",
+            (min_streak, time.time() - within_hours * 3600))}
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM hits").fetchone()[0]
+
+    # ---------- JSON 导入 / 导出 ----------
+
+    def export_json(self, json_path=HIT_JSON):
+        """按 VID 排序导出当前命中记录，时间为秒级时间戳"""
+        data = {}
+        for row in sorted(self._rows("1", ()), key=lambda r: r["vid"]):
+            vid = row.pop("vid")
+            for key in ("firstSeen", "lastSeen", "changedAt"):
+                row[key] = int(row[key])
+            data[vid] = row
+        dump_json(json_path, data)
+        return len(data)
+
+    def import_json(self, json_path=HIT_JSON):
+        """数据库为空（例如工作流缓存失效）时从导出的 hits.json 恢复，返回导入条数"""
+        if self.count() or not os.path.exists(json_path):
+            return 0
+        data = load_json(json_path)
+        rows = [(vid, r["token"], r["isvUrl"], r.get("source"), r["firstSeen"], r["lastSeen"],
+                 r["changedAt"], int(r.get("active", True))) for vid, r in data.items()]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO hits(vid, token, isv_url, source, first_seen, last_seen, changed_at, active) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO hit_events(vid, token, isv_url, source, seen_at) VALUES(?, ?, ?, ?, ?)",
+                [(r[0], r[1], r[2], r[3], r[4]) for r in rows])
+        return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询活动命中记录")
+    parser.add_argument("query", choices=["recent", "changed", "tokens"])
+    parser.add_argument("--hours", type=float, default=24, help="recent / changed 的时间窗口")
+    parser.add_argument("--db", default=HIT_DB)
+    args = parser.parse_args()
+
+    with HitStore(args.db) as store:
+        store.import_json()
+        if args.query == "tokens":
+            result = store.active_tokens()
+        elif args.query == "recent":
+            result = store.recent_hits(args.hours)
+        else:
+            result = store.changed_since(args.hours)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
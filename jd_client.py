@@ -0,0 +1,223 @@
+import json
+import os
+import re
+import time
+import urllib.parse
+from rate_limit import parse_retry_after
+
+# 按需导入：各工作流只安装自己用到的 HTTP 库
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+# ================= 配置区 =================
+# 可通过环境变量 JD_API_BASE 指向本地模拟服务（见 bench/mock_jd_server.py）
+API_BASE = os.environ.get("JD_API_BASE", "https://api.m.jd.com").rstrip("/")
+API_URL = f"{API_BASE}/client.action"
+MOBILE_UA = "Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1"
+DESKTOP_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+EID_TOKEN = "jdd03K6QR2YT3GL7KPXOLIFG637VJG2VAQ63BLVYVW4IF3LG7CTBI7T2EUN42IUOJQMG4TOVKQXXZMB43ZQ7CNUOAOWFARYAAAAM36NROQYYAAAAACED3TOGFVFNEJMX"
+POOL_SIZE = 10             # 连接池上限
+KEEPALIVE_SECONDS = 30     # 空闲连接保活时间
+# =========================================
+
+
+def _now_ms():
+    return str(int(time.time() * 1000))
+
+
+def _vender_body(vid):
+    return json.dumps({"venderId": str(vid), "source": "m-shop"})
+
+
+# ---------- whx_getMShopOutlineInfo ----------
+
+def outline_headers(ua=MOBILE_UA):
+    return {
+        'accept': 'application/json, text/plain, */*',
+        'Origin': 'https://shop.m.jd.com/',
+        'Referer': 'https://shop.m.jd.com/',
+        'User-Agent': ua
+    }
+
+
+def build_outline_url(vid):
+    body_enc = urllib.parse.quote(_vender_body(vid))
+    return f"{API_URL}?functionId=whx_getMShopOutlineInfo&body={body_enc}&t={_now_ms()}&appid=shop_view"
+
+
+def parse_outline(res_json):
+    """从店铺概要响应中取出 shopInfo，缺失时返回空字典"""
+    if not isinstance(res_json, dict):
+        return {}
+    return (res_json.get("data") or {}).get("shopInfo") or {}
+
+
+def normalize_shop(shop_info):
+    """把 shopInfo 规整为 shop_info.json 的记录格式，没有 shopId 时返回 None"""
+    if not shop_info or not shop_info.get("shopId"):
+        return None
+    return {
+        "shopId": str(shop_info.get("shopId", "")) or "000",
+        "shopName": shop_info.get("shopName", "") or "已退店"
+    }
+
+
+# ---------- whx_getShopHomeActivityInfo ----------
+
+def activity_headers(ua=DESKTOP_UA):
+    return {
+        "accept": "*/*",
+        "content-type": "application/x-www-form-urlencoded",
+        "referer": "https://shop.m.jd.com/",
+        "user-agent": ua,
+        "x-rp-client": "h5_1.0.0"
+    }
+
+
+def build_activity_form(vid):
+    return {
+        "functionId": "whx_getShopHomeActivityInfo",
+        "body": _vender_body(vid),
+        "t": _now_ms(),
+        "appid": "shop_m_jd_com",
+        "clientVersion": "11.0.0",
+        "client": "wh5",
+        "x-api-eid-token": EID_TOKEN
+    }
+
+
+def parse_activity(res_json):
+    """
+    解析店铺活动响应
+    返回元组: (是否业务成功, isvUrl, 错误信息)
+    """
+    if not isinstance(res_json, dict) or res_json.get("code") != "0":
+        msg = res_json.get("msg", "未知错误") if isinstance(res_json, dict) else "未知错误"
+        return False, "", msg
+    sign_status = (res_json.get("result") or {}).get("signStatus") or {}
+    isv_url = sign_status.get("isvUrl") or ""
+    return True, isv_url, ""
+
+
+def extract_token(isv_url, default="Missing"):
+    match = re.search(r'token=([^&]+)', isv_url)
+    return match.group(1) if match else default
+
+
+# ---------- 客户端 ----------
+
+class AsyncJDClient:
+    """
+    基于 httpx 的异步客户端，一次运行只建立一个连接池并复用 keep-alive 连接
+    用法: async with AsyncJDClient() as client: ...
+    传入 metrics（metrics.RunMetrics）时记录每次请求的延迟与状态码
+    传入 limiter（rate_limit.RateLimiter）时每次请求前取令牌，并把 403/429 反馈给限速器
+    """
+
+    def __init__(self, timeout=10, ua=MOBILE_UA, metrics=None, limiter=None):
+        if httpx is None:
+            raise ImportError("缺少依赖 httpx，请先执行 pip install httpx")
+        self.ua = ua
+        self.metrics = metrics
+        self.limiter = limiter
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            verify=False,
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE,
+                max_keepalive_connections=POOL_SIZE,
+                keepalive_expiry=KEEPALIVE_SECONDS,
+            ),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def get_shop_outline(self, vid):
+        """
+        查询店铺概要
+        返回元组: (status_code, shop_info)，非 200 时 shop_info 为 None
+        """
+        if self.limiter:
+            waited = await self.limiter.wait_async()
+            if self.metrics:
+                self.metrics.add_phase("sleep", waited)
+        start = time.perf_counter()
+        status = None
+        try:
+            response = await self._client.get(build_outline_url(vid), headers=outline_headers(self.ua))
+            status = response.status_code
+        finally:
+            if self.metrics:
+                self.metrics.observe_request("whx_getMShopOutlineInfo", time.perf_counter() - start, status)
+        if self.limiter:
+            self.limiter.feedback(status, parse_retry_after(response.headers.get("Retry-After")))
+        if response.status_code != 200:
+            return response.status_code, None
+        return 200, parse_outline(response.json())
+
+
+class JDSession:
+    """
+    基于 requests.Session 的同步客户端，复用连接池
+    用法: with JDSession() as session: ...
+    传入 metrics（metrics.RunMetrics）时记录每次请求的延迟与状态码
+    传入 limiter（rate_limit.RateLimiter）时每次请求前取令牌，并把 403/429 反馈给限速器
+    """
+
+    def __init__(self, timeout=10, metrics=None, limiter=None):
+        if requests is None:
+            raise ImportError("缺少依赖 requests，请先执行 pip install requests")
+        self.timeout = timeout
+        self.metrics = metrics
+        self.limiter = limiter
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._session.close()
+
+    def get_activity(self, vid, ua=DESKTOP_UA):
+        """
+        查询店铺活动
+        返回元组: (status_code, res_json)，非 200 时 res_json 为 None
+        """
+        if self.limiter:
+            waited = self.limiter.wait()
+            if self.metrics:
+                self.metrics.add_phase("sleep", waited)
+        start = time.perf_counter()
+        status = None
+        try:
+            response = self._session.post(API_URL, headers=activity_headers(ua), data=build_activity_form(vid), timeout=self.timeout)
+            status = response.status_code
+        finally:
+            if self.metrics:
+                self.metrics.observe_request("whx_getShopHomeActivityInfo", time.perf_counter() - start, status)
+        if self.limiter:
+            self.limiter.feedback(status, parse_retry_after(response.headers.get("Retry-After")))
+        if response.status_code != 200:
+            return response.status_code, None
+        return 200, response.json()
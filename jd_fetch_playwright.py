@@ -1,10 +1,14 @@
 import os
-import json
 import time
-import re
 import random
 import sys
 from playwright.sync_api import sync_playwright
+from jd_client import API_URL
+from metrics import RunMetrics
+from json_io import load_json
+from rate_limit import RateLimiter, parse_retry_after
+from run_log import RunLogger
+from scan_schedule import ScanSession, run_budget
 
 # 尝试导入混淆库
 try:
@@ -15,21 +19,118 @@ except ImportError:
 # ================= 配置区 =================
 TARGET_PATTERN = "2PAAf74aG3D61qvfKUM5dxUssJQ9"
 RUN_DURATION_MINUTES = 10     
+USE_SCHEDULER = True           # 按跨运行调度顺序扫描（见 scan_schedule.py），限时运行优先覆盖高价值店铺
 MAX_CONSECUTIVE_ERRORS = 10    # 连续报错停止阈值
+REUSE_PAGES = True             # 复用长期存活的页面，只在新建页面时加载一次店铺首页
+PAGE_POOL_SIZE = 2             # 复用页面数量
+PAGE_MAX_USES = 50             # 单个页面处理多少个 VID 后关闭重建，控制 Chromium 内存
+BLOCK_RESOURCES = True         # 拦截用不到的静态资源
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+# 可通过环境变量 JD_SHOP_BASE 指向本地模拟服务
+SHOP_BASE = os.environ.get("JD_SHOP_BASE", "https://shop.m.jd.com").rstrip("/")
 # =========================================
 
-def log(msg, level="INFO"):
-    timestamp = time.strftime("%H:%M:%S", time.localtime())
-    icons = {"INFO": "ℹ️", "SUCCESS": "✅", "ERROR": "❌", "WARN": "⚠️", "TIMER": "⏱️"}
-    print(f"[{timestamp}] {icons.get(level, '•')} {msg}", flush=True)
+# 屏蔽 Webdriver 检测（注册在 context 上，对所有页面生效）
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    window.chrome = { runtime: {} };
+    Object.defineProperty(navigator, 'languages', {get: () => ['zh-CN', 'zh']});
+"""
+
+# 页面内查询店铺活动，接口地址与 venderId 通过参数传入，脚本只需编译一次
+FETCH_SCRIPT = """
+async ({url, vid}) => {
+    try {
+        const body = encodeURIComponent(JSON.stringify({venderId: vid, source: "m-shop"}));
+        const res = await fetch(url, {
+            "method": "POST",
+            "headers": { "content-type": "application/x-www-form-urlencoded" },
+            "body": "functionId=whx_getShopHomeActivityInfo&body=" + body + "&appid=shop_m_jd_com&clientVersion=11.0.0&client=wh5"
+        });
+        if (!res.ok) {
+            return { code: "-1", msg: "HTTP " + res.status, status: res.status, retryAfter: res.headers.get("Retry-After") };
+        }
+        return await res.json();
+    } catch (e) {
+        return { code: "-1", msg: e.toString() };
+    }
+}
+"""
+
+# 分级、缓冲输出：逐条进度为 DEBUG，无活动结果合并汇总；命中与警告立即写出
+log = RunLogger()
+
+def block_heavy_resources(route):
+    """中止图片、字体、样式等请求，其余照常放行"""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
+class PagePool:
+    """
+    少量长期复用的页面，轮流使用
+    页面达到 PAGE_MAX_USES 或出错后关闭重建，避免长时间运行内存持续增长
+    """
+
+    def __init__(self, context, size, max_uses):
+        self.context = context
+        self.size = size
+        self.max_uses = max_uses
+        self._slots = []   # 每项为 [page, 已使用次数]
+        self._next = 0
+
+    def _new_page(self):
+        page = self.context.new_page()
+        # 优化 3：Stealth 注入优化
+        stealth_sync(page)
+        return page
+
+    def acquire(self):
+        """取出一个页面，返回 (page, 是否为新页面需要先打开店铺首页)"""
+        if len(self._slots) < self.size:
+            slot = [self._new_page(), 0]
+            self._slots.append(slot)
+        else:
+            slot = self._slots[self._next]
+            self._next = (self._next + 1) % self.size
+            if slot[1] >= self.max_uses or slot[0].is_closed():
+                self._close(slot[0])
+                slot[0], slot[1] = self._new_page(), 0
+        slot[1] += 1
+        return slot[0], slot[1] == 1
+
+    def discard(self, page):
+        """页面出错后丢弃，下次轮到时重建"""
+        for slot in self._slots:
+            if slot[0] is page:
+                self._close(page)
+                slot[1] = self.max_uses
+                return
+
+    def close(self):
+        for page, _ in self._slots:
+            self._close(page)
+        self._slots = []
+
+    @staticmethod
+    def _close(page):
+        try:
+            if not page.is_closed():
+                page.close()
+        except Exception:
+            pass
 
 def run_task():
     vid_file = "vid.json"
     if not os.path.exists(vid_file):
         log("vid.json 不存在", "ERROR")
         return
-    with open(vid_file, "r") as f:
-        vender_ids = json.load(f)
+    metrics = RunMetrics("jd_fetch_playwright", limits={
+        "RUN_DURATION_MINUTES": RUN_DURATION_MINUTES, "MAX_CONSECUTIVE_ERRORS": MAX_CONSECUTIVE_ERRORS,
+        "REUSE_PAGES": REUSE_PAGES, "PAGE_POOL_SIZE": PAGE_POOL_SIZE, "PAGE_MAX_USES": PAGE_MAX_USES})
+    with metrics.timed("json_load"):
+        vender_ids = load_json(vid_file)
 
     script_start_time = time.time()
     consecutive_errors = 0 # 连续错误计数器
@@ -60,85 +161,105 @@ def run_task():
             timezone_id="Asia/Shanghai"
         )
 
+        # 优化 4：额外注入 JavaScript 屏蔽 Webdriver 检测
+        context.add_init_script(STEALTH_SCRIPT)
+
+        # 优化 5：拦截图片、字体、样式等用不到的资源，节省带宽与页面加载时间
+        if BLOCK_RESOURCES:
+            context.route("**/*", block_heavy_resources)
+
+        # 不复用时每个 VID 使用一个新页面（用一次即回收）
+        pool = PagePool(context,
+                        PAGE_POOL_SIZE if REUSE_PAGES else 1,
+                        PAGE_MAX_USES if REUSE_PAGES else 1)
+
+        # 请求节奏由全局限速器控制（与其他抓取脚本共享额度）
+        limiter = RateLimiter()
+
+        # 高优先级店铺先扫，其余从上次停止处继续轮转，多次限时运行合起来覆盖全部 VID
+        scan = ScanSession(vender_ids, metrics, log, source="jd_fetch_playwright", target=TARGET_PATTERN,
+                           budget=run_budget(RUN_DURATION_MINUTES, limiter.rate),
+                           use_scheduler=USE_SCHEDULER, token_default="N/A")
+
         log("任务启动：已加载深度 Stealth 优化配置", "INFO")
 
         try:
-            for vid in vender_ids:
+            for vid in scan.order:
                 if (time.time() - script_start_time) / 60 >= RUN_DURATION_MINUTES:
                     log("达到时长上限，停止", "TIMER")
+                    metrics.count("stop_runtime")
+                    break
+                backoff = limiter.pending_delay()
+                if (time.time() - script_start_time) + backoff >= RUN_DURATION_MINUTES * 60:
+                    log(f"限速退避 {int(backoff)}s 超出剩余时长，停止", "TIMER")
+                    metrics.count("stop_backoff")
                     break
 
-                page = context.new_page()
-                
-                # 优化 3：Stealth 注入优化
-                stealth_sync(page)
-                
-                # 优化 4：额外注入 JavaScript 屏蔽 Webdriver 检测
-                page.add_init_script("""
-                    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-                    window.chrome = { runtime: {} };
-                    Object.defineProperty(navigator, 'languages', {get: () => ['zh-CN', 'zh']});
-                """)
+                page, is_new = pool.acquire()
 
                 try:
-                    log(f"正在扫描店铺: {vid}", "INFO")
-                    # 降低加载压力
-                    page.goto(f"https://shop.m.jd.com/shop/home?venderId={vid}", 
-                              wait_until="domcontentloaded", # 只要 DOM 好了就执行，减少被 WAF 捕捉的时间
-                              timeout=20000)
-                    
-                    # 模拟随机人类行为：停留 1-3 秒
-                    time.sleep(random.uniform(1, 3))
-
-                    fetch_script = f"""
-                    async () => {{
-                        try {{
-                            const res = await fetch("https://api.m.jd.com/client.action", {{
-                                "method": "POST",
-                                "headers": {{ "content-type": "application/x-www-form-urlencoded" }},
-                                "body": "functionId=whx_getShopHomeActivityInfo&body=%7B%22venderId%22%3A%22{vid}%22%2C%22source%22%3A%22m-shop%22%7D&appid=shop_m_jd_com&clientVersion=11.0.0&client=wh5"
-                            }});
-                            return await res.json();
-                        }} catch (e) {{
-                            return {{ code: "-1", msg: e.toString() }};
-                        }}
-                    }}
-                    """
-                    res_json = page.evaluate(fetch_script)
+                    log(f"正在扫描店铺: {vid}", "DEBUG")
+                    if is_new:
+                        # 新页面先打开店铺首页，获得同源环境；复用的页面直接发起查询
+                        metrics.count("page_loads")
+                        with metrics.timed("page_load"):
+                            page.goto(f"{SHOP_BASE}/shop/home?venderId={vid}",
+                                      wait_until="domcontentloaded", # 只要 DOM 好了就执行，减少被 WAF 捕捉的时间
+                                      timeout=20000)
+
+                        # 模拟随机人类行为：停留 1-3 秒
+                        with metrics.timed("sleep"):
+                            time.sleep(random.uniform(1, 3))
+
+                    metrics.add_phase("sleep", limiter.wait())
+                    metrics.count("queried")
+                    start = time.perf_counter()
+                    res_json = None
+                    try:
+                        res_json = page.evaluate(FETCH_SCRIPT, {"url": API_URL, "vid": str(vid)})
+                    finally:
+                        # 页面内 fetch 拿不到 HTTP 状态码，按业务 code 计数
+                        code = f"code_{res_json.get('code')}" if isinstance(res_json, dict) else None
+                        metrics.observe_request("whx_getShopHomeActivityInfo", time.perf_counter() - start, code)
+                        if isinstance(res_json, dict):
+                            # 非 2xx 响应带回 HTTP 状态码；只有业务成功才按 200 上报（清零退避），
+                            # 页面内 fetch 抛错（网络异常）或业务失败时按无状态码上报，不影响退避等级
+                            status = res_json.get("status") or (200 if res_json.get("code") == "0" else None)
+                            limiter.feedback(status, parse_retry_after(res_json.get("retryAfter")))
 
                     if res_json and res_json.get("code") == "0":
                         # 成功响应，重置连续错误计数
                         consecutive_errors = 0
                         isv_url = res_json.get("result", {}).get("signStatus", {}).get("isvUrl", "")
-                        if TARGET_PATTERN in isv_url:
-                            token = re.search(r'token=([^&]+)', isv_url).group(1) if "token=" in isv_url else "N/A"
-                            log(f"🎯 命中店铺 {vid} | Token: {token}", "SUCCESS")
-                        else:
-                            log(f"店铺 {vid} 正常无活动", "INFO")
+                        scan.record(vid, isv_url)
                     else:
                         # 触发风控或接口错误
                         consecutive_errors += 1
+                        metrics.count("biz_errors")
                         error_msg = res_json.get('msg', '风控拦截')
                         log(f"店铺 {vid} 异常 ({consecutive_errors}/{MAX_CONSECUTIVE_ERRORS}): {error_msg}", "WARN")
-                        
+
                         if consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
                             log("连续报错 10 次，判断当前 IP 已被京东封锁，程序自毁中...", "ERROR")
+                            metrics.count("stop_errors")
                             break
 
                 except Exception as e:
                     consecutive_errors += 1
+                    metrics.count("page_errors")
                     log(f"页面崩溃 ({consecutive_errors}/{MAX_CONSECUTIVE_ERRORS}): {e}", "WARN")
+                    pool.discard(page)
                     if consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                        metrics.count("stop_errors")
                         break
-                finally:
-                    page.close()
-                
-                # 随机冷却，保护 IP
-                time.sleep(random.uniform(3, 7))
 
         finally:
+            log.summarize()
+            scan.close()
+            pool.close()
             browser.close()
             log("任务结束，清理完成", "INFO")
+            log(f"运行报告: {metrics.write()}", "INFO")
 
 if __name__ == "__main__":
     run_task()
@@ -1,25 +1,25 @@
-import requests
-import json
 import time
-import re
 import os
-import random
 import sys
 from fake_useragent import UserAgent
+from jd_client import JDSession, DESKTOP_UA, parse_activity
+from metrics import RunMetrics
+from json_io import load_json
+from rate_limit import RateLimiter, MAX_RATE_PER_SEC
+from run_log import RunLogger
+from scan_schedule import ScanSession, run_budget
 
 # ================= 配置区 =================
 DEBUG_MODE = False  # 设置为 True 则进入测试模式，不发送实际请求
 MAX_CONTINUOUS_ERRORS = 5
+RUN_DURATION_MINUTES = 30  # 单次运行时长上限：与其他工作流共用额度，限时让出；未扫完的由断点在下次继续
 VID_FILE = "vid.json"
 TARGET_PATTERN = "2PAAf74aG3D61qvfKUM5dxUssJQ9"
+USE_SCHEDULER = True  # 按跨运行调度顺序扫描（见 scan_schedule.py）；False 时每次都从 vid.json 开头扫描
 # =========================================
 
-def log(msg, level="INFO"):
-    """实时打印日志函数"""
-    timestamp = time.strftime("%H:%M:%S", time.localtime())
-    icons = {"INFO": "ℹ️", "SUCCESS": "✅", "ERROR": "❌", "WARN": "⚠️", "DEBUG": "🔍"}
-    # flush=True 保证 GitHub Action 实时显示
-    print(f"[{timestamp}] {icons.get(level, '•')} {msg}", flush=True)
+# 分级、缓冲输出：逐条进度为 DEBUG，无活动结果合并汇总；命中与警告立即写出，保证 GitHub Action 及时显示
+log = RunLogger()
 
 def run_task():
     log("🚀 京东多账号轮询任务启动", "INFO")
@@ -28,9 +28,12 @@ def run_task():
         log(f"找不到配置文件: {VID_FILE}", "ERROR")
         return
 
+    metrics = RunMetrics("jd_fetch_requests", limits={"MAX_CONTINUOUS_ERRORS": MAX_CONTINUOUS_ERRORS,
+                                                      "RUN_DURATION_MINUTES": RUN_DURATION_MINUTES})
+
     try:
-        with open(VID_FILE, "r") as f:
-            vender_ids = json.load(f)
+        with metrics.timed("json_load"):
+            vender_ids = load_json(VID_FILE)
     except Exception as e:
         log(f"VID 文件解析失败: {e}", "ERROR")
         return
@@ -41,74 +44,76 @@ def run_task():
     except:
         ua = None
 
+    # 高优先级店铺先扫，其余从上次停止处继续轮转；熔断退出时也保存断点并导出命中记录
+    scan = ScanSession(vender_ids, metrics, log, source="jd_fetch_requests", target=TARGET_PATTERN,
+                       budget=run_budget(RUN_DURATION_MINUTES, MAX_RATE_PER_SEC),
+                       use_scheduler=USE_SCHEDULER)
+    try:
+        run_queries(scan.order, ua, metrics, scan)
+    finally:
+        log.summarize()
+        scan.close()
+
+    log("🏁 所有任务处理完毕", "SUCCESS")
+    log(f"运行报告: {metrics.write()}", "INFO")
+
+def run_queries(vender_ids, ua, metrics, scan):
     error_count = 0
-    url = "https://api.m.jd.com/client.action"
-
-    for vid in vender_ids:
-        if error_count >= MAX_CONTINUOUS_ERRORS:
-            log(f"已连续报错 {MAX_CONTINUOUS_ERRORS} 次，触发熔断，程序退出。", "ERROR")
-            sys.exit(1)
-
-        random_ua = ua.random if ua else "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        log(f"正在处理 VenderID: {vid} (当前连续错误: {error_count})", "INFO")
-
-        if DEBUG_MODE:
-            log(f"[测试模式] 模拟请求 VID: {vid}, 使用 UA: {random_ua[:40]}...", "DEBUG")
-            time.sleep(0.5)
-            continue
-
-        # 构造请求
-        current_t = str(int(time.time() * 1000))
-        headers = {
-            "accept": "*/*",
-            "content-type": "application/x-www-form-urlencoded",
-            "referer": "https://shop.m.jd.com/",
-            "user-agent": random_ua,
-            "x-rp-client": "h5_1.0.0"
-        }
-        data = {
-            "functionId": "whx_getShopHomeActivityInfo",
-            "body": json.dumps({"venderId": str(vid), "source": "m-shop"}),
-            "t": current_t,
-            "appid": "shop_m_jd_com",
-            "clientVersion": "11.0.0",
-            "client": "wh5",
-            "x-api-eid-token": "jdd03K6QR2YT3GL7KPXOLIFG637VJG2VAQ63BLVYVW4IF3LG7CTBI7T2EUN42IUOJQMG4TOVKQXXZMB43ZQ7CNUOAOWFARYAAAAM36NROQYYAAAAACED3TOGFVFNEJMX"
-        }
-
-        try:
-            response = requests.post(url, headers=headers, data=data, timeout=10)
-            
-            if response.status_code != 200:
-                error_count += 1
-                log(f"HTTP 状态异常: {response.status_code}", "WARN")
+    deadline = time.time() + RUN_DURATION_MINUTES * 60
+    limiter = RateLimiter()
+
+    # 整个运行周期共用一个 Session，复用 keep-alive 连接；请求节奏由全局限速器控制
+    with JDSession(timeout=10, metrics=metrics, limiter=limiter) as session:
+        for vid in vender_ids:
+            if time.time() >= deadline:
+                log("达到时长上限，停止", "TIMER")
+                metrics.count("stop_runtime")
+                break
+            backoff = limiter.pending_delay()
+            if time.time() + backoff >= deadline:
+                log(f"限速退避 {int(backoff)}s 超出剩余时长，停止", "TIMER")
+                metrics.count("stop_backoff")
+                break
+
+            if error_count >= MAX_CONTINUOUS_ERRORS:
+                log(f"已连续报错 {MAX_CONTINUOUS_ERRORS} 次，触发熔断，程序退出。", "ERROR")
+                metrics.count("stop_errors")
+                log(f"运行报告: {metrics.write()}", "INFO")
+                sys.exit(1)
+
+            random_ua = ua.random if ua else DESKTOP_UA
+            log(f"正在处理 VenderID: {vid} (当前连续错误: {error_count})", "DEBUG")
+
+            if DEBUG_MODE:
+                log(f"[测试模式] 模拟请求 VID: {vid}, 使用 UA: {random_ua[:40]}...", "DEBUG")
+                time.sleep(0.5)
                 continue
 
-            res_json = response.json()
-            if res_json.get("code") != "0":
-                error_count += 1
-                log(f"业务请求失败: {res_json.get('msg', '未知错误')}", "WARN")
-                continue
+            try:
+                metrics.count("queried")
+                status, res_json = session.get_activity(vid, ua=random_ua)
 
-            # 成功则重置计数
-            error_count = 0
-            
-            isv_url = res_json.get("result", {}).get("signStatus", {}).get("isvUrl", "")
-            if TARGET_PATTERN in isv_url:
-                token_match = re.search(r'token=([^&]+)', isv_url)
-                token = token_match.group(1) if token_match else "Missing"
-                log(f"匹配成功! Token: {token}", "SUCCESS")
-                log(f"完整链接: {isv_url}", "DEBUG")
-            else:
-                log(f"VID {vid} 无目标活动", "INFO")
+                if status != 200:
+                    error_count += 1
+                    metrics.count("http_errors")
+                    log(f"HTTP 状态异常: {status}", "WARN")
+                    continue
 
-            time.sleep(random.uniform(2, 4))
+                ok, isv_url, msg = parse_activity(res_json)
+                if not ok:
+                    error_count += 1
+                    metrics.count("biz_errors")
+                    log(f"业务请求失败: {msg}", "WARN")
+                    continue
 
-        except Exception as e:
-            error_count += 1
-            log(f"网络异常: {e}", "ERROR")
+                # 成功则重置计数
+                error_count = 0
+                scan.record(vid, isv_url)
 
-    log("🏁 所有任务处理完毕", "SUCCESS")
+            except Exception as e:
+                error_count += 1
+                metrics.count("network_errors")
+                log(f"网络异常: {e}", "ERROR")
 
 if __name__ == "__main__":
     run_task()
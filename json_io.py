@@ -0,0 +1,172 @@
+import filecmp
+import json
+import os
+import re
+from run_log import echo
+
+# 可选依赖：安装了 orjson 时用它解析（通常快数倍），否则使用标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ================= 配置区 =================
+MAX_REPORTED_POSITIONS = 5   # 修复时最多报告多少处损坏位置
+LINES_PER_CHUNK = 10000      # 流式写出时每个文本片段包含的行数
+# =========================================
+
+# 除 \t \n \r 以外的 ASCII 控制字符；UTF-8 多字节序列中不会出现这些字节，可直接按字节删除
+_CONTROL_BYTES = bytes(c for c in range(32) if c not in (9, 10, 13))
+_CONTROL_RE = re.compile(b'[' + re.escape(_CONTROL_BYTES) + b']')
+
+
+class JSONLoadError(ValueError):
+    """清理控制字符后仍无法解析；带出错位置（行、列、字节偏移）"""
+
+    def __init__(self, path, lineno, colno, pos, msg):
+        super().__init__(f"{path} 第 {lineno} 行第 {colno} 列（字节 {pos}）解析失败: {msg}")
+        self.path = path
+        self.lineno = lineno
+        self.colno = colno
+        self.pos = pos
+
+
+def loads(raw):
+    """解析 bytes / str，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _line_col(raw, pos):
+    lineno = raw.count(b'\n', 0, pos) + 1
+    return lineno, pos - (raw.rfind(b'\n', 0, pos) + 1) + 1
+
+
+def _describe(raw, positions):
+    parts = [f"第 {line} 行第 {col} 列" for line, col in (_line_col(raw, p) for p in positions)]
+    return "、".join(parts)
+
+
+def _report_damage(msg):
+    echo(msg, "WARN")
+
+
+def load_bytes(raw, path="<bytes>", tolerant=True, report=_report_damage):
+    """
+    解析 JSON 字节串
+    失败且 tolerant 时按字节删除控制字符后重试（字符串内允许换行等），并通过 report 报告损坏位置
+    仍然失败时抛出 JSONLoadError
+    """
+    try:
+        return loads(raw)
+    except ValueError as e:
+        if not tolerant:
+            raise
+        first_error = e
+
+    positions = [m.start() for m, _ in zip(_CONTROL_RE.finditer(raw), range(MAX_REPORTED_POSITIONS))]
+    cleaned = raw.translate(None, _CONTROL_BYTES)
+    try:
+        data = json.loads(cleaned, strict=False)
+    except json.JSONDecodeError as e:
+        lineno, colno = _line_col(cleaned, e.pos)
+        raise JSONLoadError(path, lineno, colno, e.pos, e.msg) from first_error
+
+    removed = len(raw) - len(cleaned)
+    if report:
+        where = _describe(raw, positions) if positions else f"字节 {getattr(first_error, 'pos', '?')}"
+        more = " 等" if removed > len(positions) else ""
+        report(f"⚠️ {path} 存在损坏：{where}{more}，已删除 {removed} 个控制字符后加载")
+    return data
+
+
+def load_json(path, tolerant=True, report=_report_damage):
+    """读取 JSON 文件，参数同 load_bytes"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return load_bytes(raw, path=path, tolerant=tolerant, report=report)
+
+
+def write_atomic(path, content):
+    """先写同目录临时文件并落盘，再原子替换目标文件；进程中途被杀也不会留下半截文件"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _compact(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps_lines(data):
+    """
+    紧凑且按行稳定的 JSON 文本：顶层数组每个元素一行、顶层对象每个键一行，行内不留空格
+    同样的数据总是得到同样的文本；增删一条记录只影响相邻的一两行
+    """
+    compact = _compact
+    if isinstance(data, list):
+        lines = [compact(item) for item in data]
+        return '[\n' + ',\n'.join(lines) + '\n]' if lines else '[]'
+    if isinstance(data, dict):
+        lines = [compact(str(key)) + ':' + compact(value) for key, value in data.items()]
+        return '{\n' + ',\n'.join(lines) + '\n}' if lines else '{}'
+    return compact(data)
+
+
+def iter_dumps_lines(items, lines_per_chunk=LINES_PER_CHUNK):
+    """dumps_lines 的流式版本（顶层数组）：逐批产出文本片段，拼接结果与 dumps_lines(list(items)) 相同"""
+    prefix, lines = '[\n', []
+    for item in items:
+        lines.append(_compact(item))
+        if len(lines) >= lines_per_chunk:
+            yield prefix + ',\n'.join(lines)
+            prefix, lines = ',\n', []
+    if lines:
+        yield prefix + ',\n'.join(lines)
+        prefix = ',\n'
+    yield '[]' if prefix == '[\n' else '\n]'
+
+
+def write_chunks_if_changed(path, chunks):
+    """
+    write_if_changed 的流式版本：chunks 依次产出的文本（或字节）片段边生成边写入临时文件，
+    再与现有文件逐块比较，相同则丢弃临时文件，不同则原子替换；内存只与单个片段的大小有关
+    返回是否写出
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_if_changed(path, content):
+    """与现有文件内容相同时跳过写入（文件与 mtime 都不变），否则原子写出；返回是否写出"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    try:
+        if os.path.getsize(path) == len(content):
+            with open(path, 'rb') as f:
+                if f.read() == content:
+                    return False
+    except OSError:
+        pass
+    write_atomic(path, content)
+    return True
+
+
+def dump_json(path, data):
+    """以 dumps_lines 格式写出 JSON，内容未变时不写；返回是否写出"""
+    return write_if_changed(path, dumps_lines(data))
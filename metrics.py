@@ -0,0 +1,103 @@
+import bisect
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+
+# ================= 配置区 =================
+REPORT_DIR = os.environ.get("METRICS_DIR", "reports")   # 运行报告输出目录（工作流上传为 artifact）
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+# =========================================
+
+
+def _percentile(ordered, q):
+    """最近秩法，ordered 需已排序"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class RunMetrics:
+    """
+    单次运行的结构化指标
+    - 请求延迟直方图（按接口分组）与状态码计数
+    - 各阶段耗时：network / sleep / json_load / json_save 等
+    - 业务计数：查询、成功、跳过、缓存命中等
+    运行结束调用 write() 输出 reports/<script>.json
+    """
+
+    def __init__(self, script, limits=None):
+        self.script = script
+        self.limits = limits or {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.counters = {}
+        self.status_codes = {}
+        self.phases = {}
+        self.latencies = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def status(self, code):
+        key = str(code)
+        self.status_codes[key] = self.status_codes.get(key, 0) + 1
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, phase):
+        """累计一段代码的耗时到指定阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(phase, time.perf_counter() - start)
+
+    def observe_request(self, endpoint, seconds, status=None):
+        """记录一次请求：延迟计入直方图与 network 阶段，状态码单独计数（异常时传 None）"""
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        self.add_phase("network", seconds)
+        self.status("error" if status is None else status)
+
+    def _histogram(self, samples):
+        ordered = sorted(samples)
+        counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        for s in ordered:
+            counts[bisect.bisect_left(LATENCY_BUCKETS_MS, s * 1000)] += 1
+        buckets = {f"le_{upper}ms": n for upper, n in zip(LATENCY_BUCKETS_MS, counts)}
+        buckets[f"gt_{LATENCY_BUCKETS_MS[-1]}ms"] = counts[-1]
+        return {
+            "count": len(ordered),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+            "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "buckets": buckets,
+        }
+
+    def report(self):
+        elapsed = time.perf_counter() - self._start
+        phases = {k: round(v, 3) for k, v in self.phases.items()}
+        phases["other"] = round(max(elapsed - sum(self.phases.values()), 0.0), 3)
+        return {
+            "script": self.script,
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "elapsed_seconds": round(elapsed, 3),
+            "limits": self.limits,
+            "counters": self.counters,
+            "status_codes": self.status_codes,
+            "phases_seconds": phases,
+            "latency": {endpoint: self._histogram(samples) for endpoint, samples in self.latencies.items()},
+        }
+
+    def write(self, report_dir=REPORT_DIR):
+        """写出 JSON 报告，返回文件路径"""
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"{self.script}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
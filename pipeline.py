@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import os
+import time
+import clean_vid
+import getshopinfo
+import sync_vids
+from jd_client import AsyncJDClient
+from shop_store import ShopStore, SHOP_DB, SHOP_DATA, migrate_layout
+from vidset import VidSet
+from metrics import RunMetrics
+from rate_limit import RateLimiter
+from checkpoint import Checkpointer
+from run_log import RunLogger
+
+# ================= 配置区 =================
+# 单进程依次执行：同步新库 -> 刷新店铺信息 -> 清洗分类文件
+# 各阶段共用一次加载的 VID 库、店铺库、连接池与限速器
+# 输出文件在运行中定期原子保存（checkpoint.py），结束时（含异常退出）再补写一次
+STAGES = ("sync", "shopinfo", "clean")
+# =========================================
+
+log = RunLogger("%Y-%m-%d %H:%M:%S", icons=False)
+
+def export_shops(store):
+    log(f"💾 正在导出 {SHOP_DATA}...")
+    store.export_json(SHOP_DATA)
+
+async def run_pipeline(stages=STAGES):
+    start_time = time.time()
+    # 首次启用分片时先拆分旧的单文件
+    migrate_layout(log)
+    sync_vids.migrate_new_layout(log)
+    if not os.path.exists(SHOP_DATA) and not os.path.exists(SHOP_DB):
+        log(f"❌ 错误: {SHOP_DATA} 不存在")
+        return
+    if "sync" in stages and (not os.path.exists(sync_vids.OLD_FILE) or not os.path.exists(sync_vids.NEW_DATA)):
+        log("❌ 错误: 找不到 VID 库文件")
+        return
+
+    metrics = RunMetrics("pipeline", limits={"STAGES": list(stages)})
+    stage_metrics = {}
+
+    # 1. 一次性加载共享数据
+    log("📂 正在加载店铺库与 VID 库...")
+    with metrics.timed("json_load"):
+        store = ShopStore(SHOP_DB)
+        if store.sync_from_json(SHOP_DATA):
+            log(f"📥 {SHOP_DATA} 有更新，已导入数据库")
+        if "sync" in stages:
+            old_vids = VidSet.load(sync_vids.OLD_FILE)
+            new_vids = VidSet.load(sync_vids.NEW_DATA)
+    log(f"✅ 加载完成，店铺 {store.count()} 条")
+
+    # 2. 需要联网的阶段共用一个连接池与限速器
+    # 输出定期原子保存（见 checkpoint.Checkpointer），运行被中断时已完成的查询不会丢失
+    stage_metrics["sync"] = sync_vids.new_metrics()
+    stage_metrics["shopinfo"] = getshopinfo.new_metrics()
+    sync_checkpoint = Checkpointer(
+        lambda next_index: sync_vids.save_outputs(old_vids, new_vids, next_index, stage_metrics["sync"]))
+    shop_checkpoint = Checkpointer(lambda _: export_shops(store))
+    try:
+        if "sync" in stages or "shopinfo" in stages:
+            limiter = RateLimiter()
+            async with AsyncJDClient(limiter=limiter) as client:
+                if "sync" in stages:
+                    log("===== 阶段: 同步新库 =====")
+                    client.metrics = stage_metrics["sync"]
+                    with metrics.timed("stage_sync"):
+                        await sync_vids.sync_stage(client, store, limiter, old_vids, new_vids,
+                                                   stage_metrics["sync"], sync_checkpoint)
+
+                if "shopinfo" in stages:
+                    log("===== 阶段: 刷新店铺信息 =====")
+                    client.metrics = stage_metrics["shopinfo"]
+                    with metrics.timed("stage_shopinfo"):
+                        await getshopinfo.refresh_stage(client, store, limiter, stage_metrics["shopinfo"],
+                                                        shop_checkpoint if getshopinfo.EXPORT_JSON else None)
+
+        # 3. 清洗阶段直接使用内存中的最新店铺状态
+        if "clean" in stages:
+            log("===== 阶段: 清洗分类文件 =====")
+            stage_metrics["clean"] = clean_vid.new_metrics()
+            with metrics.timed("stage_clean"):
+                clean_vid.clean_stage(frozenset(store.valid_vids()), stage_metrics["clean"])
+    finally:
+        # 4. 写出剩余输出（同步有进度时断点总是写出；店铺库有未导出的变化才导出）
+        # 同步阶段写回店铺库的结果不单独触发导出，在这里随最后一次导出写出
+        sync_queried = stage_metrics["sync"].counters.get("queried", 0) > 0
+        with metrics.timed("json_save"):
+            if "sync" in stages:
+                sync_checkpoint.flush(force=True)
+            if getshopinfo.EXPORT_JSON:
+                shop_checkpoint.flush(force=sync_queried)
+        store.close()
+
+    for name, m in stage_metrics.items():
+        if name in stages:
+            m.write()
+    log(f"🏁 流水线结束，耗时 {int(time.time() - start_time)}s")
+    log(f"📈 运行报告: {metrics.write()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="单进程串联 sync_vids / getshopinfo / clean_vid")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="要执行的阶段（按固定顺序执行）")
+    args = parser.parse_args()
+    stages = tuple(s for s in STAGES if s in args.stages)
+    asyncio.run(run_pipeline(stages))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不加锁
+    fcntl = None
+
+# ================= 配置区 =================
+STATE_FILE = os.environ.get("JD_RATE_STATE", "rate_limit_state.json")
+MAX_RATE_PER_SEC = float(os.environ.get("JD_MAX_RPS", "0.5"))   # 所有脚本合计的请求速率上限，<= 0 表示不限速
+BURST = 3                  # 令牌桶容量：空闲后允许的短时突发请求数
+BACKOFF_BASE_SEC = 30      # 遇到 403/429 时的首次退避时长
+BACKOFF_MAX_SEC = 1800     # 退避上限
+THROTTLE_STATUSES = (403, 429)
+# =========================================
+
+
+def parse_retry_after(value):
+    """解析 Retry-After（只支持秒数），无法解析时返回 None"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    跨脚本共享的令牌桶限速器，状态持久化在 STATE_FILE 中（同机多进程通过文件锁互斥）
+    - wait() / wait_async()：取一个令牌，必要时等待；有余量时不等待
+    - feedback()：上报响应状态，403/429 按 Retry-After 或指数退避暂停所有请求，成功后退避等级清零
+    """
+
+    def __init__(self, bucket="jd_api", rate=MAX_RATE_PER_SEC, burst=BURST, state_file=STATE_FILE):
+        self.bucket = bucket
+        self.rate = rate
+        self.burst = burst
+        self.state_file = state_file
+
+    @contextmanager
+    def _locked_state(self):
+        """加锁读取状态，退出时写回"""
+        with open(self.state_file, 'a+', encoding='utf-8') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    all_state = json.loads(f.read() or "{}")
+                except ValueError:
+                    all_state = {}
+                state = all_state.setdefault(self.bucket, {})
+                state.setdefault("tokens", float(self.burst))
+                state.setdefault("updated_at", time.time())
+                state.setdefault("blocked_until", 0.0)
+                state.setdefault("backoff_level", 0)
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(all_state, ensure_ascii=False, indent=2))
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refill(self, state, now):
+        elapsed = max(now - state["updated_at"], 0.0)
+        state["tokens"] = min(float(self.burst), state["tokens"] + elapsed * self.rate)
+        state["updated_at"] = now
+
+    def reserve(self):
+        """预占一个令牌，返回需要等待的秒数（不实际等待）"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.time()
+        with self._locked_state() as state:
+            self._refill(state, now)
+            state["tokens"] -= 1
+            delay = -state["tokens"] / self.rate if state["tokens"] < 0 else 0.0
+            return max(delay, state["blocked_until"] - now, 0.0)
+
+    def pending_delay(self):
+        """当前若发起请求需要等待的秒数（不占用令牌），用于判断剩余运行时间是否足够"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.time()
+        with self._locked_state() as state:
+            self._refill(state, now)
+            delay = (1 - state["tokens"]) / self.rate if state["tokens"] < 1 else 0.0
+            return max(delay, state["blocked_until"] - now, 0.0)
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def wait_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def feedback(self, status, retry_after=None):
+        """上报一次响应结果；返回本次设置的退避秒数（未退避时为 0）"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.time()
+        with self._locked_state() as state:
+            if status in THROTTLE_STATUSES:
+                backoff = min(BACKOFF_BASE_SEC * (2 ** state["backoff_level"]), BACKOFF_MAX_SEC)
+                if retry_after is not None:
+                    backoff = max(backoff if status == 403 else 0.0, retry_after)
+                state["backoff_level"] += 1
+                state["blocked_until"] = max(state["blocked_until"], now + backoff)
+                return backoff
+            if status == 200:
+                state["backoff_level"] = 0
+            return 0.0
@@ -0,0 +1,131 @@
+"""
+脚本共用的日志：分级、同类高频日志合并、缓冲输出
+- 低于 LOG_LEVEL 的日志直接丢弃（环境变量 JD_LOG_LEVEL 可覆盖，如 DEBUG 时输出逐条处理进度）
+- 带 category 的日志视为高频同类日志：第一条原样输出，之后每 LOG_SAMPLE_EVERY 条合并为一行汇总
+- 所有日志先进入共享缓冲区，按行数/时间批量写出；命中（SUCCESS）、警告及以上、进程退出时立即写出
+- 多个模块的日志共用一个缓冲区，流水线中各阶段的输出顺序不会错乱；
+  库函数（json_io、shard_store 等）的默认输出 echo() 也写入同一缓冲区
+
+用法:
+    log = RunLogger()
+    log("任务启动")                                   # INFO
+    log(f"VID {vid} 无目标活动", category="no_activity")  # 合并输出
+    log(f"匹配成功! Token: {token}", "SUCCESS")         # 立即写出
+    log.summarize()                                   # 循环结束后输出未满一组的汇总
+"""
+import atexit
+import os
+import sys
+import time
+
+# ================= 配置区 =================
+LOG_LEVEL = os.environ.get("JD_LOG_LEVEL", "INFO").upper()   # 最低输出级别
+LOG_SAMPLE_EVERY = 200       # 同类高频日志每多少条合并为一行
+LOG_BUFFER_LINES = 100       # 缓冲区达到多少行时写出
+LOG_FLUSH_SECONDS = 5        # 缓冲区最长停留时间，超过后下一条日志到来时写出
+# =========================================
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "SUCCESS": 25, "TIMER": 25, "WARN": 30, "ERROR": 40}
+ICONS = {"DEBUG": "🔍", "INFO": "ℹ️", "SUCCESS": "✅", "TIMER": "⏱️", "WARN": "⚠️", "ERROR": "❌"}
+FLUSH_LEVEL = LEVELS["SUCCESS"]   # 此级别及以上立即写出
+
+
+class _Sink:
+    """共享的行缓冲区，一次 write + flush 写出一批日志"""
+
+    def __init__(self):
+        self.lines = []
+        self.last_flush = time.monotonic()
+
+    def write(self, line, urgent=False):
+        self.lines.append(line)
+        if (urgent or len(self.lines) >= LOG_BUFFER_LINES
+                or time.monotonic() - self.last_flush >= LOG_FLUSH_SECONDS):
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.lines:
+            return
+        text = "\n".join(self.lines) + "\n"
+        self.lines = []
+        # 写出时才取 sys.stdout，重定向（如压测时屏蔽输出）同样生效
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+_sink = _Sink()
+_loggers = []
+
+
+def echo(msg, level="INFO"):
+    """不带时间戳与图标写入共享缓冲区，作为库函数 log/report 参数的默认值（代替 print）"""
+    if LEVELS.get(level, LEVELS["INFO"]) >= LEVELS.get(LOG_LEVEL, LEVELS["INFO"]):
+        _sink.write(msg, urgent=LEVELS.get(level, 0) >= FLUSH_LEVEL)
+
+
+class RunLogger:
+    """
+    log(msg, level="INFO", category=None)
+    time_format 为时间戳格式；icons 为 False 时不加级别图标（消息自带 emoji 的脚本）
+    """
+
+    def __init__(self, time_format="%H:%M:%S", icons=True, level=None, sample_every=None):
+        self.time_format = time_format
+        self.icons = icons
+        self.level = LEVELS.get(level or LOG_LEVEL, LEVELS["INFO"])
+        self.sample_every = sample_every or LOG_SAMPLE_EVERY
+        self._tally = {}   # category -> [未输出条数, 累计条数, 最近一条消息, 级别]
+        _loggers.append(self)
+
+    def _emit(self, msg, level):
+        prefix = f"[{time.strftime(self.time_format, time.localtime())}] "
+        if self.icons:
+            prefix += f"{ICONS.get(level, '•')} "
+        _sink.write(prefix + msg, urgent=LEVELS.get(level, 0) >= FLUSH_LEVEL)
+
+    def __call__(self, msg, level="INFO", category=None):
+        if LEVELS.get(level, LEVELS["INFO"]) < self.level:
+            return
+        if category is None:
+            self._emit(msg, level)
+            return
+        tally = self._tally.get(category)
+        if tally is None:
+            # 每类的第一条原样输出，便于了解日志内容
+            self._tally[category] = [0, 1, msg, level]
+            self._emit(msg, level)
+            return
+        tally[0] += 1
+        tally[1] += 1
+        tally[2], tally[3] = msg, level
+        if tally[0] >= self.sample_every:
+            self._emit_summary(tally)
+
+    def _emit_summary(self, tally):
+        pending, total, msg, level = tally
+        self._emit(f"{msg}（合并同类 {pending} 条，累计 {total} 条）", level)
+        tally[0] = 0
+
+    def summarize(self):
+        """输出各类尚未汇总的条数，并写出缓冲区"""
+        for tally in self._tally.values():
+            if tally[0]:
+                self._emit_summary(tally)
+        _sink.flush()
+
+    def counts(self):
+        """各类高频日志的累计条数"""
+        return {category: tally[1] for category, tally in self._tally.items()}
+
+    @staticmethod
+    def flush():
+        _sink.flush()
+
+
+@atexit.register
+def _shutdown():
+    # 正常结束、sys.exit 与未捕获异常时都会执行；被 SIGKILL 时缓冲区中最多丢失 LOG_FLUSH_SECONDS 内的日志
+    for logger in _loggers:
+        logger.summarize()
+    _sink.flush()
@@ -0,0 +1,189 @@
+"""
+vid.json 扫描的跨运行调度：每次运行的扫描顺序 = 高优先级店铺 + 从断点开始的轮转
+- 高优先级：当前仍有目标活动、或最近 PRIORITY_HOURS 小时内活动发生过变化的店铺（见 HitStore.priority_vids），
+  每次运行最先扫描，限时运行也能第一时间发现 token 变化与活动下线；
+  数量不超过单次运行预算（时长 × 限速）的 PRIORITY_SHARE，保证每次运行轮转都能推进，超出的按原位置参与轮转
+- 轮转：其余 VID 按 vid.json 顺序从持久化断点（scan_cursor.json）开始、到末尾后回到开头，
+  运行中途停止（限时、熔断）时下次从停止处继续，多次运行合起来保证全量覆盖
+- 长期无活动的店铺（连续 DORMANT_STREAK 次无目标活动，且最近 DORMANT_RESCAN_HOURS 小时内扫描过）
+  排到轮转末尾；超过复查间隔后回到原位置，不会被永久跳过
+- 断点为两个抓取脚本共用：两者扫描同一份 vid.json，轮流推进同一个位置；
+  断点格式与读写同 sync_vids 的同步断点（见 vidset.load_cursor / save_cursor）
+- ScanSession 封装两个抓取脚本共用的流程：加载命中记录与扫描计划、记录每个 VID 的结果、结束时保存断点并导出
+
+用法:
+    python scan_schedule.py              # 查看下一次运行的扫描计划
+"""
+import argparse
+from json_io import load_json
+from hit_store import HitStore, HIT_SEEN
+from jd_client import extract_token
+from vidset import VidSet, load_cursor, save_cursor, cursor_start
+
+# ================= 配置区 =================
+SCAN_CURSOR_FILE = 'scan_cursor.json'   # 轮转断点（工作流提交，缓存失效时也不会从头开始）
+PRIORITY_HOURS = 24 * 7     # 最近多少小时内活动有变化的店铺优先扫描
+PRIORITY_LIMIT = 500        # 高优先级店铺数量上限，避免挤占轮转
+PRIORITY_SHARE = 0.5        # 高优先级最多占单次运行预算的比例（预算未知时只受 PRIORITY_LIMIT 限制）
+DORMANT_STREAK = 10         # 连续多少次无目标活动视为长期无活动
+DORMANT_RESCAN_HOURS = 72   # 长期无活动的店铺在此时长内扫描过则排到轮转末尾
+# =========================================
+
+
+def run_budget(minutes, rate):
+    """单次运行最多能查询的 VID 数（时长 × 限速）；不限时或不限速时返回 None"""
+    if not minutes or rate <= 0:
+        return None
+    return int(minutes * 60 * rate)
+
+
+class ScanScheduler:
+    """
+    plan() 给出本次运行的扫描顺序；每个 VID 成功查询后调用 done(vid)，结束时 save() 推进断点
+    vids 为 vid.json 中的原始条目（字符串或整数），计划中原样返回
+    budget 为单次运行最多能查询的 VID 数（见 run_budget），用于限制高优先级的数量
+    """
+
+    def __init__(self, vids, hits, cursor_path=SCAN_CURSOR_FILE, budget=None):
+        self.hits = hits
+        self.cursor_path = cursor_path
+        self.budget = budget
+        self._items = {}
+        for item in vids:
+            self._items.setdefault(str(item), item)
+        self.keys = VidSet(self._items)
+        self.cursor = load_cursor(cursor_path)
+        # 轮转到末尾后回到开头
+        start = cursor_start(self.cursor, self.keys.position, len(self.keys))
+        self.start = start[0] % len(self.keys) if start and self.keys else 0
+        self.priority = []
+        self.dormant = []
+        self._rotation_pos = {}
+        self._furthest = None
+        self.scanned = 0
+
+    def plan(self):
+        """本次运行的扫描顺序：高优先级 -> 从断点开始的轮转 -> 长期无活动"""
+        known = self._items
+        self.priority = [vid for vid in self.hits.priority_vids(PRIORITY_HOURS, PRIORITY_LIMIT)
+                         if vid in known][:self.priority_limit()]
+        skip = set(self.priority)
+        dormant = self.hits.dormant_vids(DORMANT_STREAK, DORMANT_RESCAN_HOURS) - skip
+        n = len(self.keys)
+        rotation, self.dormant = [], []
+        for offset in range(n):
+            vid = self.keys[(self.start + offset) % n]
+            if vid in skip:
+                continue
+            (self.dormant if vid in dormant else rotation).append(vid)
+        # 断点只按正常轮转部分推进；长期无活动的店铺排在末尾，是否扫到不影响断点
+        self._rotation_pos = {vid: i for i, vid in enumerate(rotation)}
+        return [known[vid] for vid in self.priority + rotation + self.dormant]
+
+    def priority_limit(self):
+        """本次运行的高优先级数量上限：至少留出 1 - PRIORITY_SHARE 的预算给轮转"""
+        if self.budget is None:
+            return PRIORITY_LIMIT
+        return min(PRIORITY_LIMIT, int(self.budget * PRIORITY_SHARE))
+
+    def describe(self):
+        first = self.keys[self.start] if self.keys else None
+        budget = f"，本次预算约 {self.budget} 个" if self.budget is not None else ""
+        return (f"扫描计划: 共 {len(self.keys)} 个 VID{budget}，优先 {len(self.priority)} 个，"
+                f"轮转从第 {self.start + 1} 个 ({first}) 开始，长期无活动后置 {len(self.dormant)} 个")
+
+    def done(self, vid):
+        """VID 已成功查询（命中或无活动）"""
+        self.scanned += 1
+        pos = self._rotation_pos.get(str(vid))
+        if pos is not None and (self._furthest is None or pos > self._furthest):
+            self._furthest = pos
+
+    def next_start(self):
+        """下一次运行的轮转起点（vid.json 下标）与对应的 last_vid"""
+        if self._furthest is None:
+            return self.start, (self.cursor or {}).get("last_vid")
+        rotation = sorted(self._rotation_pos, key=self._rotation_pos.get)
+        last_vid = rotation[self._furthest]
+        return (self.keys.position(last_vid) + 1) % len(self.keys), last_vid
+
+    def save(self):
+        """保存轮转断点（位置未变时不改写文件，不产生提交），返回下一次的起点下标"""
+        next_index, last_vid = self.next_start()
+        save_cursor(self.cursor_path, next_index, last_vid)
+        return next_index
+
+
+class ScanSession:
+    """
+    抓取脚本共用的扫描流程，用法:
+        scan = ScanSession(vids, metrics, log, source="jd_fetch_requests", target=TARGET_PATTERN, budget=budget)
+        for vid in scan.order:
+            ...查询成功后 scan.record(vid, isv_url)
+        scan.close()   # 放在 finally 中：熔断退出时也保存断点并导出命中记录
+    命中记录持久化，数据库缓存失效时从 hits.json 恢复；use_scheduler 为 False 时按 vids 原顺序扫描
+    """
+
+    def __init__(self, vids, metrics, log, source, target, budget=None, use_scheduler=True,
+                 token_default="Missing"):
+        self.metrics = metrics
+        self.log = log
+        self.source = source
+        self.target = target
+        self.token_default = token_default
+        self.hits = HitStore()
+        self.hits.import_json()
+        # 高优先级店铺先扫，其余从上次停止处继续轮转
+        self.scheduler = ScanScheduler(vids, self.hits, budget=budget) if use_scheduler else None
+        self.order = vids
+        if self.scheduler:
+            self.order = self.scheduler.plan()
+            metrics.count("scheduled_priority", len(self.scheduler.priority))
+            metrics.count("scheduled_dormant", len(self.scheduler.dormant))
+            log(self.scheduler.describe(), "INFO")
+
+    def record(self, vid, isv_url):
+        """VID 查询成功（命中或无活动）：推进断点，写入命中记录并计数"""
+        if self.scheduler:
+            self.scheduler.done(vid)
+        if self.target in isv_url:
+            token = extract_token(isv_url, default=self.token_default)
+            result = self.hits.record_hit(vid, isv_url, token, source=self.source)
+            self.metrics.count("hits")
+            if result != HIT_SEEN:
+                self.metrics.count(f"hits_{result}")
+            self.log(f"🎯 命中店铺 {vid} | Token: {token}" + ("" if result == HIT_SEEN else f" ({result})"),
+                     "SUCCESS")
+            self.log(f"完整链接: {isv_url}", "INFO")
+        else:
+            if self.hits.record_no_activity(vid):
+                self.metrics.count("hits_gone")
+            self.metrics.count("no_activity")
+            self.log(f"VID {vid} 无目标活动", category="no_activity")
+
+    def close(self):
+        """保存轮转断点并导出命中记录"""
+        if self.scheduler:
+            self.log(f"下次从第 {self.scheduler.save() + 1} 个 VID 继续轮转", "INFO")
+        self.hits.export_json()
+        self.hits.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看 vid.json 的下一次扫描计划")
+    parser.add_argument("vid_file", nargs="?", default="vid.json")
+    parser.add_argument("--head", type=int, default=20, help="列出计划中的前几个 VID")
+    args = parser.parse_args()
+
+    with HitStore() as hits:
+        hits.import_json()
+        scheduler = ScanScheduler(load_json(args.vid_file), hits)
+        order = scheduler.plan()
+    print(scheduler.describe())
+    for item in order[:args.head]:
+        tag = "优先" if str(item) in scheduler.priority else "轮转"
+        print(f"  {tag} {item}")
+
+
+if __name__ == "__main__":
+    main()
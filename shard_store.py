@@ -0,0 +1,277 @@
+"""
+分片存储：把 shop_info / new_vid 拆成目录下的许多小文件，运行只重写改动过的分片
+- 字典（shop_info）按 VID 的 crc32 哈希分到固定数量的分片，查询单个 VID 只需载入一个分片
+- 列表（new_vid）按位置每 LIST_CHUNK_SIZE 条一片；同步只在末尾追加，只会改动最后一两片
+- 目录下的 manifest.json 记录布局（类型、分片数），写入后不再变化，不会成为冲突点
+- 分片内容为 json_io.dumps_lines 格式，内容未变的分片不重写
+- 数据位置以 .json 结尾时为单文件，否则为分片目录，读写接口相同
+- 默认不启用（USE_SHARDS = False）；启用后单文件 <目录名>.json 默认继续同步写出（KEEP_SINGLE_FILE），
+  直接读取原始 JSON 的下游不受影响，迁移也不会删除单文件
+
+用法:
+    python shard_store.py split shop_info.json shop_info     # 单文件拆分为分片目录
+    python shard_store.py split new_vid.json new_vid
+    python shard_store.py join shop_info shop_info.json      # 分片目录合并为单文件
+    python shard_store.py stat shop_info
+    python shard_store.py get shop_info 10457
+"""
+import argparse
+import hashlib
+import json
+import os
+import zlib
+from json_io import load_json, dumps_lines, write_if_changed
+from run_log import echo
+
+# ================= 配置区 =================
+USE_SHARDS = False       # True 时店铺数据与新库以分片目录读写（需手动开启）；False 时沿用单个 JSON 文件
+KEEP_SINGLE_FILE = True  # 启用分片后仍同步写出单文件（shop_info.json / new_vid.json），供读取原始 JSON 的下游使用
+MAP_SHARD_COUNT = 64     # 字典分片数（只在新建目录时生效，之后以 manifest 为准）
+LIST_CHUNK_SIZE = 2000   # 列表每个分片的条数（同上）
+# =========================================
+
+MANIFEST = 'manifest.json'
+
+
+def is_sharded(path):
+    """以 .json 结尾的是单文件，否则是分片目录"""
+    return not path.endswith('.json')
+
+
+def _read_manifest(folder, kind):
+    path = os.path.join(folder, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    manifest = load_json(path)
+    if manifest.get("kind") != kind:
+        raise ValueError(f"{folder} 不是{'字典' if kind == 'map' else '列表'}分片目录")
+    return manifest
+
+
+def _write_manifest(folder, manifest):
+    os.makedirs(folder, exist_ok=True)
+    write_if_changed(os.path.join(folder, MANIFEST), dumps_lines(manifest))
+
+
+def _shard_files(folder):
+    """目录下的分片文件名（按名称排序，不含 manifest）"""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(f for f in os.listdir(folder) if f.endswith('.json') and f != MANIFEST)
+
+
+class ShardedMap:
+    """
+    VID -> 记录 的分片字典，分片按需载入
+    修改过的分片在 save() 时写出；遍历按分片顺序、分片内按写入顺序
+    """
+
+    def __init__(self, folder, shard_count=None):
+        self.folder = folder
+        manifest = _read_manifest(folder, "map")
+        self.shard_count = manifest["shard_count"] if manifest else (shard_count or MAP_SHARD_COUNT)
+        self._width = len(str(self.shard_count - 1))
+        self._shards = {}
+        self._dirty = set()
+
+    def shard_of(self, vid):
+        return zlib.crc32(str(vid).encode('utf-8')) % self.shard_count
+
+    def shard_name(self, index):
+        return f"{index:0{self._width}d}.json"
+
+    def shard(self, index):
+        """载入（并缓存）第 index 个分片，文件不存在时为空字典"""
+        data = self._shards.get(index)
+        if data is None:
+            path = os.path.join(self.folder, self.shard_name(index))
+            data = self._shards[index] = load_json(path) if os.path.exists(path) else {}
+        return data
+
+    def get(self, vid, default=None):
+        return self.shard(self.shard_of(vid)).get(str(vid), default)
+
+    def __getitem__(self, vid):
+        return self.shard(self.shard_of(vid))[str(vid)]
+
+    def __contains__(self, vid):
+        return str(vid) in self.shard(self.shard_of(vid))
+
+    def __setitem__(self, vid, record):
+        index = self.shard_of(vid)
+        self.shard(index)[str(vid)] = record
+        self._dirty.add(index)
+
+    def update(self, data):
+        for vid, record in data.items():
+            self[vid] = record
+
+    def items(self):
+        for index in range(self.shard_count):
+            yield from self.shard(index).items()
+
+    def __len__(self):
+        return sum(len(self.shard(index)) for index in range(self.shard_count))
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def save(self):
+        """写出修改过的分片（内容未变的不重写），返回实际写出的分片数"""
+        _write_manifest(self.folder, {"kind": "map", "shard_count": self.shard_count, "hash": "crc32"})
+        written = 0
+        for index in sorted(self._dirty):
+            path = os.path.join(self.folder, self.shard_name(index))
+            written += write_if_changed(path, dumps_lines(self._shards[index]))
+        self._dirty.clear()
+        return written
+
+    @classmethod
+    def write(cls, folder, data):
+        """用 data 整体覆盖分片目录，只重写内容有变化的分片；返回实际写出的分片数"""
+        shards = cls(folder)
+        shards._shards = {index: {} for index in range(shards.shard_count)}
+        for vid, record in data.items():
+            shards._shards[shards.shard_of(vid)][str(vid)] = record
+        shards._dirty = set(shards._shards)
+        return shards.save()
+
+
+def load_list(folder):
+    """按分片顺序拼接列表分片"""
+    _read_manifest(folder, "list")
+    items = []
+    for name in _shard_files(folder):
+        items.extend(load_json(os.path.join(folder, name)))
+    return items
+
+
+def write_list(folder, items):
+    """
+    按位置切分写出列表，只重写内容有变化的分片，多余的旧分片删除
+    返回实际写出（含删除）的分片数
+    """
+    manifest = _read_manifest(folder, "list")
+    chunk_size = manifest["chunk_size"] if manifest else LIST_CHUNK_SIZE
+    _write_manifest(folder, {"kind": "list", "chunk_size": chunk_size})
+    items = list(items)
+    names = []
+    written = 0
+    for index, start in enumerate(range(0, len(items), chunk_size)):
+        names.append(f"{index:05d}.json")
+        written += write_if_changed(os.path.join(folder, names[-1]), dumps_lines(items[start:start + chunk_size]))
+    for name in _shard_files(folder):
+        if name not in names:
+            os.remove(os.path.join(folder, name))
+            written += 1
+    return written
+
+
+def shard_digests(folder):
+    """每个分片文件的 sha1（不解析内容）"""
+    digests = {}
+    for name in _shard_files(folder):
+        with open(os.path.join(folder, name), 'rb') as f:
+            digests[name] = hashlib.sha1(f.read()).hexdigest()
+    return digests
+
+
+def combine_digests(digests):
+    """由各分片摘要得到整个目录的摘要"""
+    lines = "".join(f"{name} {digest}\n" for name, digest in sorted(digests.items()))
+    return hashlib.sha1(lines.encode('utf-8')).hexdigest()
+
+
+# ---------- 单文件与分片目录通用的读写 ----------
+
+def single_file(folder):
+    """分片目录对应的单文件路径：shop_info -> shop_info.json"""
+    return folder.rstrip('/\\') + '.json'
+
+
+def write_single_file(folder, data):
+    """KEEP_SINGLE_FILE 时把分片目录的完整内容同步写出为单文件，返回是否改写"""
+    if not KEEP_SINGLE_FILE:
+        return False
+    return write_if_changed(single_file(folder), dumps_lines(data))
+
+
+def load_map(path):
+    return ShardedMap(path).to_dict() if is_sharded(path) else load_json(path)
+
+
+def dump_map(path, data):
+    """写出字典，返回是否有文件被改写"""
+    if is_sharded(path):
+        written = ShardedMap.write(path, data) > 0
+        return write_single_file(path, data) or written
+    return write_if_changed(path, dumps_lines(data))
+
+
+def load_items(path):
+    return load_list(path) if is_sharded(path) else load_json(path)
+
+
+def dump_items(path, items):
+    """写出列表，返回是否有文件被改写"""
+    if is_sharded(path):
+        items = list(items)
+        written = write_list(path, items) > 0
+        return write_single_file(path, items) or written
+    return write_if_changed(path, dumps_lines(list(items)))
+
+
+def migrate(json_path, shard_dir, kind, log=echo):
+    """
+    分片目录尚不存在而单文件存在时，把单文件拆分为分片目录；单文件保留不删
+    （KEEP_SINGLE_FILE 时之后继续同步写出，否则不再更新），返回是否发生了迁移
+    """
+    if os.path.exists(shard_dir) or not os.path.exists(json_path):
+        return False
+    data = load_json(json_path)
+    if kind == "map":
+        ShardedMap.write(shard_dir, data)
+    else:
+        write_list(shard_dir, data)
+    note = "继续同步写出" if KEEP_SINGLE_FILE else "不再更新，确认下游不再读取后可手动删除"
+    log(f"📦 {json_path} 已拆分为分片目录 {shard_dir}/，单文件保留（{note}）")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片存储的拆分、合并与查看")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("split", help="单文件拆分为分片目录（对象按哈希分片，数组按位置分片）")
+    p.add_argument("src")
+    p.add_argument("dst")
+    p = sub.add_parser("join", help="分片目录合并为单文件")
+    p.add_argument("src")
+    p.add_argument("dst")
+    p = sub.add_parser("stat", help="分片数量与条数")
+    p.add_argument("folder")
+    p = sub.add_parser("get", help="只载入所在分片，查询单个 VID")
+    p.add_argument("folder")
+    p.add_argument("vid")
+    args = parser.parse_args()
+
+    if args.command == "split":
+        data = load_json(args.src)
+        written = ShardedMap.write(args.dst, data) if isinstance(data, dict) else write_list(args.dst, data)
+        print(f"{len(data)} 条 -> {args.dst}/，写出 {written} 个分片")
+    elif args.command == "join":
+        kind = load_json(os.path.join(args.src, MANIFEST))["kind"]
+        data = load_map(args.src) if kind == "map" else load_list(args.src)
+        write_if_changed(args.dst, dumps_lines(data))
+        print(f"{len(data)} 条 -> {args.dst}")
+    elif args.command == "stat":
+        manifest = load_json(os.path.join(args.folder, MANIFEST))
+        sizes = [len(load_json(os.path.join(args.folder, name))) for name in _shard_files(args.folder)]
+        print(f"{manifest}: {len(sizes)} 个分片，共 {sum(sizes)} 条，"
+              f"单片 {min(sizes, default=0)} ~ {max(sizes, default=0)} 条")
+    else:
+        shards = ShardedMap(args.folder)
+        print(json.dumps(shards.get(args.vid), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from json_io import load_bytes, dumps_lines, write_if_changed
+from run_log import echo
+from shard_store import (USE_SHARDS, ShardedMap, is_sharded, load_map, shard_digests, combine_digests,
+                         migrate, write_single_file)
+# 店铺状态与 classify 定义在 shop_table，这里重新导出供调用方继续使用
+from shop_table import (ShopTable, classify, split_record, is_valid_name,
+                        STATUS_ACTIVE, STATUS_RETIRED, STATUS_INVALID, STATUS_UNKNOWN)
+
+# ================= 配置区 =================
+SHOP_DB = 'shop_info.db'
+SHOP_JSON = 'shop_info.json'
+SHOP_SHARDS = 'shop_info'  # 分片目录（见 shard_store），每次运行只重写改动过的分片
+SHOP_DATA = SHOP_SHARDS if USE_SHARDS else SHOP_JSON  # 店铺数据的读写位置
+CACHE_TTL_HOURS = 72       # 店铺状态缓存有效期，超过后需要重新查询（sync_vids 同样使用此值）
+RECHECK_BASE_HOURS = 6     # 接口未返回店铺信息后，首次复查间隔
+RECHECK_MAX_HOURS = 24 * 14  # 复查间隔上限（每多一次未命中间隔翻倍）
+# =========================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shops (
+    vid        TEXT PRIMARY KEY,
+    shop_id    TEXT NOT NULL DEFAULT '',
+    shop_name  TEXT NOT NULL DEFAULT '',
+    status     TEXT NOT NULL,
+    checked_at REAL,             -- 最后一次接口查询时间（秒级时间戳）
+    extra      TEXT,             -- 其余字段的 JSON，导出时原样写回
+    miss_count INTEGER NOT NULL DEFAULT 0,  -- 连续未返回店铺信息的次数
+    next_check_at REAL           -- 未命中记录的下次复查时间
+);
+CREATE INDEX IF NOT EXISTS idx_shops_status ON shops(status);
+CREATE INDEX IF NOT EXISTS idx_shops_checked ON shops(checked_at);
+-- 同步时接口无记录、且不在 shop_info 中的 VID：只用于避免重复查询，不导出、不计入有效
+CREATE TABLE IF NOT EXISTS misses (
+    vid           TEXT PRIMARY KEY,
+    checked_at    REAL NOT NULL,
+    miss_count    INTEGER NOT NULL DEFAULT 0,
+    next_check_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_ADDED_COLUMNS = (
+    ("miss_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("next_check_at", "REAL"),
+)
+
+
+def file_digest(raw):
+    """计算文件内容摘要，用于判断数据库是否与 shop_info.json 同步"""
+    return hashlib.sha1(raw).hexdigest()
+
+
+def readable_shop_data():
+    """只读方（clean_vid）使用的店铺数据位置：分片目录尚未建立时退回单文件，迁移只由写入方执行"""
+    return SHOP_DATA if os.path.exists(SHOP_DATA) else SHOP_JSON
+
+
+def migrate_layout(log=echo):
+    """启用分片时把旧的 shop_info.json 拆分为分片目录（只发生一次），返回是否迁移"""
+    return USE_SHARDS and migrate(SHOP_JSON, SHOP_SHARDS, "map", log)
+
+
+class ShopStore:
+    """
+    shop_info 的 SQLite 存储（WAL 模式）
+    以 VID 为主键，单条 upsert；shop_info（单文件或分片目录）作为导入/导出格式继续保留
+    """
+
+    def __init__(self, path=SHOP_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def _migrate(self):
+        """旧版数据库（工作流缓存）补齐新增列"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(shops)")}
+        with self.conn:
+            for name, ddl in _ADDED_COLUMNS:
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE shops ADD COLUMN {name} {ddl}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_shops_recheck ON shops(status, next_check_at)")
+            # 旧版本把同步时未命中的新 VID 作为空记录写入 shops（会被导出并计为有效），移到 misses
+            if self._get_meta("misses_migrated") is None:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO misses(vid, checked_at, miss_count, next_check_at) "
+                    "SELECT vid, checked_at, miss_count, next_check_at FROM shops "
+                    "WHERE shop_id = '' AND shop_name = '' AND miss_count > 0 AND checked_at IS NOT NULL")
+                self.conn.execute("DELETE FROM shops WHERE vid IN (SELECT vid FROM misses)")
+                self._set_meta("misses_migrated", "1")
+
+    # ---------- meta ----------
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value))
+
+    # ---------- JSON 导入 / 导出 ----------
+
+    def import_json(self, json_path=SHOP_DATA):
+        """用 shop_info（单文件或分片目录）全量覆盖数据库，返回导入条数"""
+        if is_sharded(json_path):
+            data = load_map(json_path)
+            digests = shard_digests(json_path)
+            digest = combine_digests(digests)
+        else:
+            with open(json_path, 'rb') as f:
+                raw = f.read()
+            # 文件损坏时按字节清理控制字符后重试，并报告损坏位置
+            data = load_bytes(raw, path=json_path)
+            digests, digest = None, file_digest(raw)
+
+        rows = self._rows_for(data)
+        with self.conn:
+            self.conn.execute("DELETE FROM shops")
+            self.conn.executemany(
+                "INSERT INTO shops(vid, shop_id, shop_name, status, checked_at, extra, miss_count, next_check_at) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._set_synced(digest, digests)
+        return len(rows)
+
+    def _import_shards(self, folder, names, digests):
+        """只重新导入有变化的分片：分片中已不存在的 VID 删除，其余按 VID upsert，返回导入条数"""
+        shards = ShardedMap(folder)
+        changed = {int(os.path.splitext(name)[0]) for name in names}
+        data = {}
+        for index in sorted(changed):
+            data.update(shards.shard(index))
+        rows = self._rows_for(data)
+        stale = [(vid,) for (vid,) in self.conn.execute("SELECT vid FROM shops")
+                 if vid not in data and shards.shard_of(vid) in changed]
+        with self.conn:
+            self.conn.executemany("DELETE FROM shops WHERE vid = ?", stale)
+            self.conn.executemany(
+                "INSERT INTO shops(vid, shop_id, shop_name, status, checked_at, extra, miss_count, next_check_at) "
+                "VALUES(?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(vid) DO UPDATE SET shop_id = excluded.shop_id, "
+                "shop_name = excluded.shop_name, status = excluded.status, checked_at = excluded.checked_at, "
+                "extra = excluded.extra, miss_count = excluded.miss_count, next_check_at = excluded.next_check_at",
+                rows)
+            self._set_synced(combine_digests(digests), digests)
+        return len(rows)
+
+    def _set_synced(self, digest, digests=None):
+        """记录数据库与哪一份 shop_info 同步；分片目录额外记录每个分片的摘要，供下次只导入变化的分片"""
+        self._set_meta("json_digest", digest)
+        self._set_meta("shard_digests", json.dumps(digests) if digests is not None else None)
+
+    def _rows_for(self, data):
+        """shop_info 记录转换为数据库行"""
+        # 内容未变的记录沿用原查询时间与未命中记录（JSON 中不保存）；新出现的已知店铺以导入时间为准
+        now = time.time()
+        previous = {row[0]: row[1:] for row in self.conn.execute(
+            "SELECT vid, shop_id, shop_name, checked_at, miss_count, next_check_at FROM shops")}
+
+        rows = []
+        for vid, item in data.items():
+            shop_id, shop_name, extra = split_record(item)
+            status = classify(shop_id, shop_name)
+            old = previous.get(vid)
+            if old and old[:2] == (shop_id, shop_name):
+                checked_at, miss_count, next_check_at = old[2:]
+            else:
+                checked_at, miss_count, next_check_at = (now if status != STATUS_UNKNOWN else None), 0, None
+            rows.append((vid, shop_id, shop_name, status, checked_at,
+                         json.dumps(extra, ensure_ascii=False) if extra else None, miss_count, next_check_at))
+        return rows
+
+    def sync_from_json(self, json_path=SHOP_DATA):
+        """
+        shop_info 与上次导入/导出时不一致（或数据库为空）时重新导入
+        分片目录且数据库已有记录时只导入内容有变化的分片；返回是否发生了导入
+        """
+        if not os.path.exists(json_path):
+            return False
+        if not is_sharded(json_path):
+            if self.in_sync_with(json_path):
+                return False
+            self.import_json(json_path)
+            return True
+
+        digests = shard_digests(json_path)
+        if combine_digests(digests) == self._get_meta("json_digest"):
+            return False
+        stored = self._get_meta("shard_digests")
+        if stored and self.count():
+            stored = json.loads(stored)
+            changed = [name for name in set(digests) | set(stored) if digests.get(name) != stored.get(name)]
+            self._import_shards(json_path, changed, digests)
+        else:
+            self.import_json(json_path)
+        return True
+
+    def in_sync_with(self, json_path=SHOP_DATA):
+        """数据库是否由该 shop_info 导入或导出而来（之后的单条写入不影响判断）"""
+        if is_sharded(json_path):
+            digest = combine_digests(shard_digests(json_path))
+        else:
+            with open(json_path, 'rb') as f:
+                digest = file_digest(f.read())
+        return digest == self._get_meta("json_digest")
+
+    def load_table(self):
+        """整表读入紧凑的 ShopTable（按原始插入顺序，状态直接沿用数据库中的结果）"""
+        cur = self.conn.execute("SELECT vid, shop_id, shop_name, status, extra FROM shops ORDER BY rowid")
+        return ShopTable.from_rows(
+            (vid, shop_id, shop_name, status, json.loads(extra) if extra else None)
+            for vid, shop_id, shop_name, status, extra in cur)
+
+    def to_dict(self):
+        """按原始插入顺序还原为 shop_info.json 的字典结构"""
+        data = {}
+        for vid, shop_id, shop_name, extra in self.conn.execute(
+                "SELECT vid, shop_id, shop_name, extra FROM shops ORDER BY rowid"):
+            item = {"shopId": shop_id, "shopName": shop_name}
+            if extra:
+                item.update(json.loads(extra))
+            data[vid] = item
+        return data
+
+    def export_json(self, json_path=SHOP_DATA):
+        """
+        导出 shop_info（每个店铺一行，见 json_io.dumps_lines），并记录摘要以便下次跳过导入
+        分片目录只重写内容有变化的分片；单文件内容未变时不重写。返回是否有文件被改写
+        """
+        if is_sharded(json_path):
+            data = self.to_dict()
+            written = ShardedMap.write(json_path, data) > 0
+            written = write_single_file(json_path, data) or written
+            digests = shard_digests(json_path)
+            digest = combine_digests(digests)
+        else:
+            content = dumps_lines(self.to_dict()).encode('utf-8')
+            written = write_if_changed(json_path, content)
+            digests, digest = None, file_digest(content)
+        with self.conn:
+            self._set_synced(digest, digests)
+        return written
+
+    # ---------- 单条读写 ----------
+
+    def get(self, vid):
+        row = self.conn.execute(
+            "SELECT shop_id, shop_name, status, checked_at FROM shops WHERE vid = ?", (str(vid),)).fetchone()
+        if row is None:
+            return None
+        return {"shopId": row[0], "shopName": row[1], "status": row[2], "checkedAt": row[3]}
+
+    def upsert(self, vid, shop_id, shop_name, checked_at=None):
+        """写入单条记录，已存在时更新 shopId/shopName/状态并清除未命中记录；checked_at 为空时取当前时间"""
+        checked_at = time.time() if checked_at is None else checked_at
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO shops(vid, shop_id, shop_name, status, checked_at) VALUES(?, ?, ?, ?, ?) "
+                "ON CONFLICT(vid) DO UPDATE SET shop_id = excluded.shop_id, shop_name = excluded.shop_name, "
+                "status = excluded.status, checked_at = excluded.checked_at, miss_count = 0, next_check_at = NULL",
+                (str(vid), shop_id, shop_name, classify(shop_id, shop_name), checked_at))
+            self.conn.execute("DELETE FROM misses WHERE vid = ?", (str(vid),))
+
+    def record_miss(self, vid, checked_at=None):
+        """
+        接口未返回店铺信息：累加未命中次数，并按指数间隔安排下次复查，返回下次复查时间
+        shop_info 中已有的 VID 状态改为 unknown（导出的 shopId/shopName 不变，有效性仍按店铺名判断），
+        缓存期内 cached_status 不会再把刚消失的店铺报告为 active；
+        不在 shop_info 中的只记入 misses，不会被导出或计为有效
+        """
+        vid = str(vid)
+        checked_at = time.time() if checked_at is None else checked_at
+        row = self.conn.execute("SELECT miss_count FROM shops WHERE vid = ?", (vid,)).fetchone()
+        table = "shops" if row else "misses"
+        if row is None:
+            row = self.conn.execute("SELECT miss_count FROM misses WHERE vid = ?", (vid,)).fetchone()
+        miss_count = (row[0] if row else 0) + 1
+        interval = min(RECHECK_BASE_HOURS * 2 ** (miss_count - 1), RECHECK_MAX_HOURS)
+        next_check_at = checked_at + interval * 3600
+        with self.conn:
+            if table == "shops":
+                self.conn.execute(
+                    "UPDATE shops SET status = ?, checked_at = ?, miss_count = ?, next_check_at = ? WHERE vid = ?",
+                    (STATUS_UNKNOWN, checked_at, miss_count, next_check_at, vid))
+            else:
+                self.conn.execute(
+                    "INSERT INTO misses(vid, checked_at, miss_count, next_check_at) VALUES(?, ?, ?, ?) "
+                    "ON CONFLICT(vid) DO UPDATE SET checked_at = excluded.checked_at, "
+                    "miss_count = excluded.miss_count, next_check_at = excluded.next_check_at",
+                    (vid, checked_at, miss_count, next_check_at))
+        return next_check_at
+
+    def cached_status(self, vid, ttl_hours=CACHE_TTL_HOURS):
+        """
+        店铺状态缓存：记录在有效期内被查询过时返回其状态，否则返回 None（需要重新查询）
+        状态为 unknown 表示最近一次查询未返回店铺信息
+        """
+        row = self.conn.execute("SELECT status, checked_at FROM shops WHERE vid = ?", (str(vid),)).fetchone()
+        if row is None:
+            miss = self.conn.execute("SELECT checked_at FROM misses WHERE vid = ?", (str(vid),)).fetchone()
+            row = (STATUS_UNKNOWN, miss[0]) if miss else None
+        if row is None or row[1] is None or time.time() - row[1] > ttl_hours * 3600:
+            return None
+        return row[0]
+
+    # ---------- 查询 ----------
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM shops").fetchone()[0]
+
+    def vids_by_status(self, status, limit=None):
+        sql = "SELECT vid FROM shops WHERE status = ? ORDER BY rowid"
+        params = (status,)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    def pending_vids(self, limit=None, now=None):
+        """
+        信息缺失、待查询的 VID：从未查询过的优先（按文件顺序），
+        其后才是已到复查时间的未命中记录（按到期先后），未到期的不返回
+        """
+        now = time.time() if now is None else now
+        sql = ("SELECT vid FROM shops WHERE status = ? AND (next_check_at IS NULL OR next_check_at <= ?) "
+               "ORDER BY miss_count > 0, CASE WHEN miss_count > 0 THEN next_check_at END, rowid")
+        params = (STATUS_UNKNOWN, now)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    def recheck_stats(self, now=None):
+        """未命中记录统计，返回 (已到期待复查数, 未到期数)"""
+        now = time.time() if now is None else now
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(next_check_at <= ?), 0), COALESCE(SUM(next_check_at > ?), 0) "
+            "FROM shops WHERE status = ? AND miss_count > 0", (now, now, STATUS_UNKNOWN)).fetchone()
+        return row[0], row[1]
+
+    def valid_vids(self):
+        """未退店且未标记无效的 VID 集合（与 clean_vid 的过滤规则一致，信息缺失的记录按店铺名判断）"""
+        return {vid for vid, status, shop_name in self.conn.execute(
+            "SELECT vid, status, shop_name FROM shops WHERE status NOT IN (?, ?)", (STATUS_RETIRED, STATUS_INVALID))
+                if status != STATUS_UNKNOWN or is_valid_name(shop_name)}
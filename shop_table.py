@@ -0,0 +1,255 @@
+"""
+紧凑的内存店铺表：按列存储，替代 shop_info.json 的「VID -> 字典」结构
+- 状态在写入时计算一次，存为 1 字节编码；有效性判断是一次数组查表
+- shopId 多为纯数字，存入 uint64 数组；非数字的少数值单独保存
+- shopName 使用 sys.intern，"NoName"、退店名称等重复值只保留一份
+- 提供字典式接口（table[vid]["shopName"]、in、items() 等），调用方无需改写
+
+用法:
+    python shop_table.py shop_info.json
+"""
+import argparse
+import sys
+from array import array
+from shard_store import load_map
+
+# ================= 配置区 =================
+MAX_ID_DIGITS = 18   # 超过 uint64 安全范围的 shopId 按非数字值保存
+# =========================================
+
+# 店铺状态，由 shopId / shopName 推导，导入与写入时计算一次
+STATUS_ACTIVE = 'active'      # 正常店铺
+STATUS_RETIRED = 'retired'    # 已退店
+STATUS_INVALID = 'invalid'    # 无效店铺
+STATUS_UNKNOWN = 'unknown'    # 信息缺失，待查询
+
+STATUSES = (STATUS_UNKNOWN, STATUS_ACTIVE, STATUS_RETIRED, STATUS_INVALID)
+_STATUS_CODE = {status: code for code, status in enumerate(STATUSES)}
+_UNKNOWN_CODE = _STATUS_CODE[STATUS_UNKNOWN]
+# 与 clean_vid 的过滤规则一致：未退店且未标记无效
+_VALID_CODES = bytes(int(status not in (STATUS_RETIRED, STATUS_INVALID)) for status in STATUSES).ljust(256, b'\0')
+
+
+def is_valid_name(shop_name):
+    """有效性规则（与最初的 clean_vid 一致）：店铺名不含“退店”与“无效”，与 shopId 是否为空无关"""
+    return "退店" not in shop_name and "无效" not in shop_name
+
+
+def classify(shop_id, shop_name):
+    """根据 shopId / shopName 计算店铺状态"""
+    if not shop_id or not shop_name or shop_name == "NoName":
+        return STATUS_UNKNOWN
+    if "退店" in shop_name:
+        return STATUS_RETIRED
+    if "无效" in shop_name:
+        return STATUS_INVALID
+    return STATUS_ACTIVE
+
+
+def split_record(item):
+    """把 shop_info.json 中的一条记录拆成 (shop_id, shop_name, extra)"""
+    if not isinstance(item, dict):
+        return "", "NoName", None
+    # vender 为早期遗留字段，导入时直接丢弃
+    extra = {k: v for k, v in item.items() if k not in ("shopId", "shopName", "vender")}
+    return str(item.get("shopId", "") or ""), str(item.get("shopName", "") or ""), extra or None
+
+
+def _id_to_int(shop_id):
+    """规范的正整数 shopId 转整数，其余（空、前导 0、非数字）返回 None"""
+    if shop_id.isdigit() and shop_id[0] != "0" and len(shop_id) <= MAX_ID_DIGITS and shop_id.isascii():
+        return int(shop_id)
+    return None
+
+
+class ShopTable:
+    """
+    按 VID 插入顺序保存的店铺表，每行: shopId / shopName / 状态编码 / 其余字段（稀疏）
+    table[vid] 返回新建的 {"shopId", "shopName", ...} 字典，修改它不影响表；写回用 table[vid] = item
+    """
+
+    __slots__ = ("_rows", "_vids", "_ids", "_odd_ids", "_names", "_status", "_extra")
+
+    def __init__(self):
+        self._rows = {}            # vid -> 行号
+        self._vids = []
+        self._ids = array('Q')     # 0 表示空或非数字（见 _odd_ids）
+        self._odd_ids = {}         # 行号 -> 非数字 shopId
+        self._names = []
+        self._status = bytearray()
+        self._extra = {}           # 行号 -> 其余字段
+
+    # ---------- 构建 ----------
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 shop_info.json 的字典结构构建"""
+        table = cls()
+        table._extend((vid,) + split_record(item) + (None,) for vid, item in data.items())
+        return table
+
+    @classmethod
+    def load_json(cls, path):
+        """读取 shop_info.json 或分片目录（见 shard_store）"""
+        return cls.from_dict(load_map(path))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """从 (vid, shop_id, shop_name, status, extra) 行构建，状态沿用已有结果不再重新计算"""
+        table = cls()
+        table._extend((vid, shop_id, shop_name, extra, status) for vid, shop_id, shop_name, status, extra in rows)
+        return table
+
+    def _extend(self, rows):
+        """批量追加 (vid, shop_id, shop_name, extra, status) 行，VID 须互不重复且不在表中"""
+        index, vids, ids, names, codes = self._rows, self._vids, self._ids, self._names, self._status
+        odd_ids, extras, intern = self._odd_ids, self._extra, sys.intern
+        row = len(vids)
+        for vid, shop_id, shop_name, extra, status in rows:
+            vid = str(vid)
+            index[vid] = row
+            vids.append(vid)
+            codes.append(_STATUS_CODE[status or classify(shop_id, shop_name)])
+            names.append(intern(shop_name))
+            value = _id_to_int(shop_id)
+            ids.append(value or 0)
+            if value is None and shop_id:
+                odd_ids[row] = shop_id
+            if extra:
+                extras[row] = extra
+            row += 1
+        if len(index) != row:
+            raise ValueError("批量追加的 VID 存在重复")
+
+    def set(self, vid, shop_id, shop_name, extra=None, status=None):
+        """写入一行（已存在时原位更新，保持顺序），status 为空时按 classify 计算"""
+        vid = str(vid)
+        code = _STATUS_CODE[status or classify(shop_id, shop_name)]
+        value = _id_to_int(shop_id)
+        row = self._rows.get(vid)
+        if row is None:
+            row = len(self._vids)
+            self._rows[vid] = row
+            self._vids.append(vid)
+            self._ids.append(value or 0)
+            self._names.append(sys.intern(shop_name))
+            self._status.append(code)
+        else:
+            self._ids[row] = value or 0
+            self._names[row] = sys.intern(shop_name)
+            self._status[row] = code
+        if value is None and shop_id:
+            self._odd_ids[row] = shop_id
+        else:
+            self._odd_ids.pop(row, None)
+        if extra:
+            self._extra[row] = extra
+        else:
+            self._extra.pop(row, None)
+
+    # ---------- 字典式接口 ----------
+
+    def __len__(self):
+        return len(self._vids)
+
+    def __contains__(self, vid):
+        return str(vid) in self._rows
+
+    def __iter__(self):
+        return iter(self._vids)
+
+    def keys(self):
+        return iter(self._vids)
+
+    def _record(self, row):
+        value = self._ids[row]
+        item = {"shopId": str(value) if value else self._odd_ids.get(row, ""), "shopName": self._names[row]}
+        extra = self._extra.get(row)
+        if extra:
+            item.update(extra)
+        return item
+
+    def __getitem__(self, vid):
+        return self._record(self._rows[str(vid)])
+
+    def get(self, vid, default=None):
+        row = self._rows.get(str(vid))
+        return default if row is None else self._record(row)
+
+    def __setitem__(self, vid, item):
+        shop_id, shop_name, extra = split_record(item)
+        self.set(vid, shop_id, shop_name, extra)
+
+    def items(self):
+        for row, vid in enumerate(self._vids):
+            yield vid, self._record(row)
+
+    def values(self):
+        for row in range(len(self._vids)):
+            yield self._record(row)
+
+    def rows(self):
+        """按插入顺序返回 (vid, shop_id, shop_name, status, extra)，与 from_rows 互逆"""
+        for row, vid in enumerate(self._vids):
+            value = self._ids[row]
+            yield (vid, str(value) if value else self._odd_ids.get(row, ""), self._names[row],
+                   STATUSES[self._status[row]], self._extra.get(row))
+
+    def to_dict(self):
+        """还原为 shop_info.json 的字典结构（按插入顺序）"""
+        data = {}
+        for vid, shop_id, shop_name, _, extra in self.rows():
+            item = {"shopId": shop_id, "shopName": shop_name}
+            if extra:
+                item.update(extra)
+            data[vid] = item
+        return data
+
+    # ---------- 状态查询 ----------
+
+    def status(self, vid):
+        """店铺状态；VID 不在表中时返回 None"""
+        row = self._rows.get(str(vid))
+        return None if row is None else STATUSES[self._status[row]]
+
+    def is_valid(self, vid):
+        """VID 在表中且未退店、未标记无效"""
+        row = self._rows.get(str(vid))
+        if row is None or not _VALID_CODES[self._status[row]]:
+            return False
+        # 信息缺失的记录（如 shopId 为空但店铺名为“已退店”）仍按店铺名判断
+        return self._status[row] != _UNKNOWN_CODE or is_valid_name(self._names[row])
+
+    def vids_by_status(self, status):
+        code = _STATUS_CODE[status]
+        return [vid for vid, c in zip(self._vids, self._status) if c == code]
+
+    def valid_vids(self):
+        """有效 VID 集合（与 ShopStore.valid_vids 结果一致）"""
+        valid = self._status.translate(_VALID_CODES)
+        return frozenset(vid for vid, ok, code, name in zip(self._vids, valid, self._status, self._names)
+                         if ok and (code != _UNKNOWN_CODE or is_valid_name(name)))
+
+    def status_counts(self):
+        return {status: self._status.count(code) for code, status in enumerate(STATUSES)}
+
+    @property
+    def nbytes(self):
+        """各列数据占用的近似字节数（不含 VID 与店铺名字符串本身）"""
+        return (sys.getsizeof(self._rows) + sys.getsizeof(self._vids) + self._ids.itemsize * len(self._ids)
+                + sys.getsizeof(self._names) + len(self._status))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计 shop_info.json 的店铺状态")
+    parser.add_argument("path", nargs="?", default="shop_info.json")
+    args = parser.parse_args()
+
+    table = ShopTable.load_json(args.path)
+    print(f"共 {len(table)} 条店铺记录")
+    for status, count in table.status_counts().items():
+        print(f"  {status}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,131 +1,198 @@
-import json
 import asyncio
 import time
 import os
-import httpx
-import urllib.parse
+from jd_client import AsyncJDClient, normalize_shop
+from shop_store import (ShopStore, SHOP_DB, SHOP_DATA, STATUS_RETIRED, STATUS_UNKNOWN, CACHE_TTL_HOURS,
+                        migrate_layout)
+from shard_store import USE_SHARDS, migrate
+from vidset import VidSet, load_cursor, save_cursor, resolve_start
+from metrics import RunMetrics
+from rate_limit import RateLimiter
+from checkpoint import Checkpointer
+from run_log import RunLogger
 
 # 配置参数
 OLD_FILE = 'old_vid.json'
 NEW_FILE = 'new_vid.json'
+NEW_SHARDS = 'new_vid'     # 新库分片目录（见 shard_store）：只追加，每次运行只改动最后的分片
+NEW_DATA = NEW_SHARDS if USE_SHARDS else NEW_FILE  # 新库的读写位置
+CURSOR_FILE = 'sync_cursor.json'  # 持久化的同步断点
 MAX_RUNTIME_MINS = 5      # 最大运行分钟数
 MAX_QUERY_COUNT = 5000     # 单词运行最大查询 vid 数量
 MAX_403_ERRORS = 10         # 允许的最大 403 报错次数
 
-def log(message):
-    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+# 逐条的有效/退店结果合并汇总；403 等警告立即写出（见 run_log.py）
+log = RunLogger("%Y-%m-%d %H:%M:%S", icons=False)
 
-async def get_ua():
-    return "Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1"
+def cached_shop_active(store, v_id):
+    """从店铺状态缓存判断是否有效，缓存缺失或过期（见 shop_store.CACHE_TTL_HOURS）时返回 None"""
+    status = store.cached_status(v_id)
+    if status is None:
+        return None
+    return status not in (STATUS_RETIRED, STATUS_UNKNOWN)
 
-async def check_shop_active(v_id):
-    """查询店铺信息，返回是否有效（未退店）"""
+async def check_shop_active(client, store, v_id):
+    """查询店铺信息，返回是否有效（未退店），结果写回店铺状态缓存"""
     try:
-        ua = await get_ua()
-        headers = {
-            'accept': 'application/json, text/plain, */*',
-            'Origin': 'https://shop.m.jd.com/',
-            'Referer': 'https://shop.m.jd.com/',
-            'User-Agent': ua
-        }
-        body = {"venderId": str(v_id), "source": "m-shop"}
-        body_enc = urllib.parse.quote(json.dumps(body))
-        url = f"https://api.m.jd.com/client.action?functionId=whx_getMShopOutlineInfo&body={body_enc}&t={int(time.time()*1000)}&appid=shop_view"
-
-        async with httpx.AsyncClient(timeout=10, verify=False) as client:
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code == 403:
-                return "403"
-            
-            if response.status_code == 200:
-                res_json = response.json()
-                shop_info = res_json.get("data", {}).get("shopInfo", {})
-                shop_name = shop_info.get("shopName", "")
-                
-                if not shop_name:
-                    return False
-                if "已退店" in shop_name:
-                    log(f"🚮 VID {v_id} 已退店 ({shop_name})")
-                    return False
-                
-                log(f"✅ VID {v_id} 有效: {shop_name}")
-                return True
+        status, shop_info = await client.get_shop_outline(v_id)
+
+        if status == 403:
+            return "403"
+
+        if status == 200:
+            record = normalize_shop(shop_info)
+            if record:
+                store.upsert(v_id, record["shopId"], record["shopName"])
+            else:
+                store.record_miss(v_id)
+            shop_name = shop_info.get("shopName", "")
+
+            if not shop_name:
+                return False
+            if "已退店" in shop_name:
+                log(f"🚮 VID {v_id} 已退店 ({shop_name})", category="retired")
+                return False
+
+            log(f"✅ VID {v_id} 有效: {shop_name}", category="active")
+            return True
     except Exception as e:
-        log(f"⚠️ 查询 VID {v_id} 发生异常: {e}")
+        log(f"⚠️ 查询 VID {v_id} 发生异常: {e}", "WARN")
     return False
 
-async def main():
-    start_time = time.time()
-    
-    # 1. 加载文件
-    if not os.path.exists(OLD_FILE) or not os.path.exists(NEW_FILE):
-        log("❌ 错误: 找不到输入文件")
-        return
-
-    with open(OLD_FILE, 'r', encoding='utf-8') as f:
-        old_vids = json.load(f)
-    with open(NEW_FILE, 'r', encoding='utf-8') as f:
-        new_vids = json.load(f)
+def new_metrics():
+    return RunMetrics("sync_vids", limits={
+        "MAX_RUNTIME_MINS": MAX_RUNTIME_MINS, "MAX_QUERY_COUNT": MAX_QUERY_COUNT,
+        "MAX_403_ERRORS": MAX_403_ERRORS, "CACHE_TTL_HOURS": CACHE_TTL_HOURS})
 
-    log(f"📊 加载完成。旧库: {len(old_vids)} 条, 当前新库: {len(new_vids)} 条")
+async def sync_stage(client, store, limiter, old_vids, new_vids, metrics, checkpoint=None):
+    """
+    同步阶段：从断点开始遍历旧库，有效店铺的 VID 追加到 new_vids
+    返回下次运行的起点 next_index，由调用方在保存时写入断点
+    传入 checkpoint（checkpoint.Checkpointer）时每条结果后上报 next_index，由它定期保存新库与断点
+    """
+    start_time = time.time()
 
-    # 2. 定位断点
-    last_vid = new_vids[-1] if new_vids else None
-    start_index = 0
-    
-    if last_vid in old_vids:
-        start_index = old_vids.index(last_vid) + 1
-        log(f"📍 找到同步断点: {last_vid}，从索引 {start_index} 开始遍历")
+    # 定位断点
+    start_index, source = resolve_start(old_vids, new_vids, load_cursor(CURSOR_FILE))
+    if source:
+        log(f"📍 找到同步断点: {source}，从索引 {start_index} 开始遍历")
     else:
-        log("📍 未在新库中找到旧库的匹配项，将从头开始遍历旧库")
+        log("📍 未找到同步断点，将从头开始遍历旧库")
 
-    # 3. 遍历旧库进行同步
+    # 遍历旧库进行同步
     query_count = 0
+    cache_hits = 0
     error_403_count = 0
     added_count = 0
+    next_index = start_index  # 下次运行的起点（不越过末尾因 403 未确认的 VID）
+    if checkpoint:
+        checkpoint.tick(next_index, n=0)
 
     for i in range(start_index, len(old_vids)):
         current_vid = old_vids[i]
-        
+
         # --- 熔断检查 ---
         # A. 时间检查
         if (time.time() - start_time) > (MAX_RUNTIME_MINS * 60):
             log(f"🕒 达到设定的运行时间上限 ({MAX_RUNTIME_MINS} min)，保存退出...")
+            metrics.count("stop_runtime")
             break
-        
+
         # B. 数量检查
         if query_count >= MAX_QUERY_COUNT:
             log(f"🔢 达到单次最大查询数量 ({MAX_QUERY_COUNT})，保存退出...")
+            metrics.count("stop_max_queries")
             break
-            
+
         # C. 403 检查
         if error_403_count >= MAX_403_ERRORS:
             log(f"🚫 连续 403 报错次数达到上限 ({MAX_403_ERRORS})，疑似被封，保存退出...")
+            metrics.count("stop_403")
             break
 
-        # 执行查询
-        status = await check_shop_active(current_vid)
-        query_count += 1
+        # 优先复用缓存，缺失或过期才请求接口
+        status = cached_shop_active(store, current_vid)
+        if status is None:
+            backoff = limiter.pending_delay()
+            if (time.time() - start_time) + backoff > MAX_RUNTIME_MINS * 60:
+                log(f"🕒 限速退避 {int(backoff)}s 超出剩余运行时间，保存退出...")
+                metrics.count("stop_backoff")
+                break
+            status = await check_shop_active(client, store, current_vid)
+            query_count += 1
+            queried = True
+        else:
+            cache_hits += 1
+            queried = False
+        metrics.count("queried" if queried else "cache_hits")
 
         if status == "403":
             error_403_count += 1
-            log(f"🚫 收到 403 拒绝 (第 {error_403_count} 次)")
-        elif status is True:
+            metrics.count("forbidden")
+            log(f"🚫 收到 403 拒绝 (第 {error_403_count} 次)", "WARN")
+        else:
+            next_index = i + 1
             # 只有有效且不重复才存入
-            if current_vid not in new_vids:
-                new_vids.append(current_vid)
-                added_count += 1
-            error_403_count = 0  # 成功后重置 403 计数
-        
-        # 控制频率
-        await asyncio.sleep(1.5)
-
-    # 4. 保存文件
-    with open(NEW_FILE, 'w', encoding='utf-8') as f:
-        json.dump(new_vids, f, ensure_ascii=False, indent=2)
-    
-    log(f"💾 同步结束。新增: {added_count} 条，目前新库总量: {len(new_vids)}")
+            if status is True:
+                if new_vids.add(current_vid):
+                    added_count += 1
+                    metrics.count("added")
+                error_403_count = 0  # 成功后重置 403 计数
+            if checkpoint:
+                # 只有接口结果计入保存周期，命中缓存只推进断点
+                checkpoint.tick(next_index, n=1 if queried else 0)
+
+    log.summarize()
+    log(f"💾 同步结束。查询: {query_count} 次，缓存命中: {cache_hits} 次，新增: {added_count} 条，目前新库总量: {len(new_vids)}")
+    return next_index
+
+def migrate_new_layout(log=log):
+    """启用分片时把旧的 new_vid.json 拆分为分片目录（只发生一次）"""
+    return USE_SHARDS and migrate(NEW_FILE, NEW_SHARDS, "list", log)
+
+def save_outputs(old_vids, new_vids, next_index, metrics):
+    with metrics.timed("json_save"):
+        new_vids.save(NEW_DATA)
+        # 同步尚未开始（如加载后、进入遍历前就出错）时没有进度，保留原断点，不写入空值
+        if next_index is not None:
+            save_cursor(CURSOR_FILE, next_index, old_vids[next_index - 1] if next_index else None)
+    metrics.count("checkpoints")
+
+async def main():
+    # 1. 加载文件（首次启用分片时先拆分旧的单文件）
+    migrate_new_layout()
+    migrate_layout(log)
+    if not os.path.exists(OLD_FILE) or not os.path.exists(NEW_DATA):
+        log("❌ 错误: 找不到输入文件")
+        return
+
+    metrics = new_metrics()
+
+    with metrics.timed("json_load"):
+        old_vids = VidSet.load(OLD_FILE)
+        new_vids = VidSet.load(NEW_DATA)
+
+    log(f"📊 加载完成。旧库: {len(old_vids)} 条, 当前新库: {len(new_vids)} 条")
+
+    # 店铺状态缓存（与 getshopinfo.py 共用）
+    with metrics.timed("json_load"):
+        store = ShopStore(SHOP_DB)
+        imported = store.sync_from_json(SHOP_DATA)
+    if imported:
+        log(f"📥 已从 {SHOP_DATA} 导入店铺状态缓存")
+
+    # 2. 遍历旧库；整个运行周期共用一个连接池，请求节奏由全局限速器控制（命中缓存时不占用额度）
+    # 新库与断点定期原子保存，运行被中断时下次从最后一次保存处继续
+    checkpoint = Checkpointer(lambda next_index: save_outputs(old_vids, new_vids, next_index, metrics))
+    limiter = RateLimiter()
+    try:
+        async with AsyncJDClient(metrics=metrics, limiter=limiter) as client:
+            await sync_stage(client, store, limiter, old_vids, new_vids, metrics, checkpoint)
+    finally:
+        # 3. 保存文件（有进度时断点总是写出）
+        checkpoint.flush(force=True)
+        store.close()
+    log(f"📈 运行报告: {metrics.write()}")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,92 @@
+"""VidIndex 向量化 / 逐项两种模式导出结果一致的回归测试"""
+import json
+import os
+
+import pytest
+
+import vid_index
+from json_io import dumps_lines
+from vid_index import VidIndex
+
+np = pytest.importorskip("numpy")
+
+CATEGORIES = {
+    "a_quoted": [str(v) for v in (5, 3, 5, 100, 7, 3)],
+    "b_plain": [3, 8, 100, 100, 42],
+    "c_pretty": [str(v) for v in (42, 8, 9)],
+    "d_empty": [],
+}
+
+
+def _write_sources(folder):
+    for name, items in CATEGORIES.items():
+        with open(os.path.join(folder, name + ".json"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(items, indent=4) if name == "c_pretty" else dumps_lines(items))
+
+
+def _export(folder, out, valid, monkeypatch=None, generic=False, workers=1):
+    if generic:
+        monkeypatch.setattr(vid_index, "np", None)
+    index = VidIndex.build(str(folder), workers=workers)
+    assert index.vectorized is not generic
+    mask = index.lookup(valid)
+    os.makedirs(out, exist_ok=True)
+    results = {}
+    for name in index.categories:
+        path = os.path.join(out, name + ".json")
+        results[name] = index.write_filtered(name, mask, path)
+        with open(path, "rb") as f:
+            results[name] += (f.read(),)
+    return results
+
+
+def test_modes_write_identical_output(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "src")
+    _write_sources(tmp_path / "src")
+    valid = {"3", "100", "42", "9"}
+    vectorized = _export(tmp_path / "src", tmp_path / "vec", valid)
+    parallel = _export(tmp_path / "src", tmp_path / "par", valid, workers=2)
+    generic = _export(tmp_path / "src", tmp_path / "gen", valid, monkeypatch, generic=True)
+    assert vectorized == generic == parallel
+    for name, items in CATEGORIES.items():
+        kept = [item for item in items if str(item) in valid]
+        assert vectorized[name][:2] == (len(items), len(kept))
+        assert vectorized[name][3] == dumps_lines(kept).encode()
+
+
+def test_unchanged_output_is_not_rewritten(tmp_path):
+    os.makedirs(tmp_path / "src")
+    _write_sources(tmp_path / "src")
+    first = _export(tmp_path / "src", tmp_path / "out", {"3"})
+    second = _export(tmp_path / "src", tmp_path / "out", {"3"})
+    assert all(result[2] for result in first.values())
+    assert not any(result[2] for result in second.values())
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path / "out"))
+
+
+def test_mixed_file_falls_back_and_keeps_item_types(tmp_path):
+    os.makedirs(tmp_path / "src")
+    _write_sources(tmp_path / "src")
+    with open(tmp_path / "src" / "e_mixed.json", "w", encoding="utf-8") as f:
+        f.write(dumps_lines(["x1", 5, "3", 3]))
+    index = VidIndex.build(str(tmp_path / "src"))
+    assert not index.vectorized
+    total, kept, _ = index.write_filtered("e_mixed", index.lookup({"3", "x1"}), str(tmp_path / "e.json"))
+    assert (total, kept) == (4, 3)
+    with open(tmp_path / "e.json", encoding="utf-8") as f:
+        assert f.read() == dumps_lines(["x1", "3", 3])
+    assert index.categories_of("3") == ["a_quoted", "b_plain", "e_mixed"]
+
+
+def test_unreadable_file_is_reported_and_skipped(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "src")
+    _write_sources(tmp_path / "src")
+    with open(tmp_path / "src" / "f_broken.json", "w", encoding="utf-8") as f:
+        f.write("not json")
+    # 非纯数字文件会让向量化模式退回逐项模式，两种构建都应报告错误并跳过该文件
+    for generic in (False, True):
+        if generic:
+            monkeypatch.setattr(vid_index, "np", None)
+        index = VidIndex.build(str(tmp_path / "src"))
+        assert "f_broken" in index.errors and "f_broken" not in index.categories
+        assert len(index) == len({str(v) for items in CATEGORIES.values() for v in items})
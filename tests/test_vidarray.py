@@ -0,0 +1,103 @@
+"""parse_id_array / format_id_array 的往返与校验回归测试"""
+import json
+
+import pytest
+
+import vidarray
+from json_io import dumps_lines
+from vidarray import parse_id_array, format_id_array, iter_id_array, _is_numeric_array, _NUMERIC_ARRAY_RE
+
+
+def _ints(parsed):
+    return [int(v) for v in parsed[0].tolist()]
+
+
+@pytest.mark.parametrize("quoted", [True, False])
+def test_round_trip_matches_dumps_lines(quoted):
+    values = [10457, 0, 999999999999999999, 10457, 35]
+    items = [str(v) for v in values] if quoted else values
+    text = dumps_lines(items)
+    parsed = parse_id_array(text.encode())
+    assert parsed is not None
+    assert _ints(parsed) == values
+    assert parsed[1] is quoted
+    assert format_id_array(parsed[0], quoted=quoted) == text
+
+
+@pytest.mark.parametrize("quoted", [True, False])
+def test_indent_matches_json_dumps(quoted):
+    values = [3, 1, 2, 1]
+    items = [str(v) for v in values] if quoted else values
+    text = json.dumps(items, indent=4)
+    parsed = parse_id_array(text.encode())
+    assert format_id_array(parsed[0], quoted=parsed[1], indent=4) == text
+
+
+def test_empty_array():
+    parsed = parse_id_array(b" [ ] \n")
+    assert parsed is not None and len(parsed[0]) == 0
+    assert format_id_array(parsed[0]) == "[]" == dumps_lines([])
+
+
+@pytest.mark.parametrize("data", [
+    b'["01"]',                          # 前导零
+    b'[-1]',                            # 负数
+    b'[1.5]',                           # 小数
+    b'["1", 2]',                        # 引号混用
+    b'[""]',                            # 空字符串
+    b'[" 1"]',                          # 引号内空白
+    b'["1 2"]',
+    b'[1234567890123456789]',           # 超过 MAX_DIGITS
+    b'["x1"]',
+    b'[1,]',
+    b'[1 2]',
+    b'{"1": 1}',
+    b'',
+])
+def test_non_canonical_input_is_rejected(data):
+    assert parse_id_array(data) is None
+
+
+def test_iter_id_array_chunks_join_to_format():
+    parsed = parse_id_array(dumps_lines([str(v) for v in range(1000, 1037)]).encode())
+    for quoted in (True, False):
+        for indent in (0, 4):
+            joined = "".join(iter_id_array(parsed[0], quoted=quoted, indent=indent, chunk_size=5))
+            assert joined == format_id_array(parsed[0], quoted=quoted, indent=indent)
+
+
+def _large(elements):
+    return ("[\n" + ",\n".join(elements) + "\n]").encode()
+
+
+def test_chunked_validation_on_large_arrays():
+    elements = [str(100000 + i) for i in range(20000)]
+    data = _large(elements)
+    assert len(data) > vidarray._VALIDATE_CHUNK
+    assert _is_numeric_array(data)
+    parsed = parse_id_array(data)
+    assert _ints(parsed) == [int(e) for e in elements]
+    assert format_id_array(parsed[0], quoted=False) == data.decode()
+
+    quoted = _large(f'"{e}"' for e in elements)
+    assert parse_id_array(quoted)[1] is True
+
+
+@pytest.mark.parametrize("position", [0, 9000, 19999])
+@pytest.mark.parametrize("bad", ['"01"', "01", "x", "", '"1 2"', "1]"])
+def test_chunked_validation_matches_full_regex(position, bad):
+    elements = [str(100000 + i) for i in range(20000)]
+    elements[position] = bad
+    data = _large(elements)
+    assert _is_numeric_array(data) == (_NUMERIC_ARRAY_RE.fullmatch(data) is not None)
+    assert not _is_numeric_array(data)
+
+
+def test_chunked_validation_at_chunk_boundaries():
+    # 坏元素落在每一个可能的分段位置附近
+    elements = [str(100000 + i) for i in range(12000)]
+    data = _large(elements)
+    cut = data.find(b",", vidarray._VALIDATE_CHUNK)
+    for offset in (-8, -1, 1, 2, 8):
+        broken = data[:cut + offset] + b"a" + data[cut + offset + 1:]
+        assert _is_numeric_array(broken) == (_NUMERIC_ARRAY_RE.fullmatch(broken) is not None)
@@ -0,0 +1,344 @@
+"""
+分类文件的跨分类 VID 索引：各分类文件大量重叠，索引把它们合并为「唯一 VID -> 所属分类」
+- 唯一 VID 只存一份，有效性等判断对每个唯一 VID 只做一次，结果按位置映射回各分类
+- 每个分类保存其条目在唯一 VID 表中的位置（保持原顺序与重复）以及是否带引号，
+  两种模式导出的分类文件逐字节一致（json_io.dumps_lines 格式，内容未变时不重写）
+- 全部文件为纯数字数组且安装了 NumPy 时走向量化模式；否则退回逐项模式（流式读取，只保留位置数组），接口相同
+- 向量化模式逐个文件解析并并入唯一 VID 表，原始字节与整数数组随即释放，只保留紧凑的位置数组；
+  workers > 1 时多个分类文件在进程池中并行解析
+
+用法:
+    python vid_index.py oldvid                 # 各分类数量、独有数量与重叠
+    python vid_index.py oldvid --vid 10457     # 查询 VID 所属分类
+    python vid_index.py oldvid --unique sjk_vid_dou
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from json_io import iter_dumps_lines, write_chunks_if_changed
+from vidarray import VidArray, np, parse_id_array, iter_id_array, sorted_unique
+
+# ================= 配置区 =================
+MAX_VECTOR_CATEGORIES = 64   # 向量化模式用 uint64 位掩码记录所属分类，超过时退回逐项模式
+# =========================================
+
+# 数组元素：JSON 字符串或整数
+_TOKEN_RE = re.compile(rb'"((?:[^"\\]|\\.)*)"|(-?\d+)')
+
+
+def iter_vids(path):
+    """
+    流式读取 VID 数组（mmap + 正则），不整体构建 Python 列表
+    文件不是 JSON 数组时抛出 ValueError
+    """
+    if os.path.getsize(path) == 0:
+        raise ValueError("空文件")
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        head = re.match(rb'\s*(.)', mm)
+        if not head or head.group(1) != b'[':
+            raise ValueError("数据格式不是数组")
+        for m in _TOKEN_RE.finditer(mm):
+            text, number = m.group(1), m.group(2)
+            if text is None:
+                yield int(number)
+            elif b'\\' in text:
+                yield json.loads(b'"' + text + b'"')
+            else:
+                yield text.decode('utf-8')
+
+
+def _position_dtype(size):
+    return np.uint32 if size < 1 << 32 else np.int64
+
+
+def parse_category(path):
+    """
+    读取并解析一个纯数字分类文件（可在工作进程中执行）
+    返回 (文件内的唯一 VID, 各条目在其中的位置, 是否带引号)，原始字节与整数数组不随结果返回；
+    文件不是纯数字数组时返回 None
+    """
+    with open(path, 'rb') as f:
+        parsed = parse_id_array(f.read())
+    if parsed is None:
+        return None
+    ints, quoted = parsed
+    # 一次排序同时得到文件内唯一 VID 与各条目的位置（比对乱序条目逐个 searchsorted 快得多）
+    order = np.argsort(ints)
+    ordered = ints[order]
+    del ints
+    first = np.ones(len(ordered), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    unique = ordered[first]
+    positions = np.empty(len(ordered), dtype=_position_dtype(len(unique)))
+    positions[order] = np.cumsum(first) - 1
+    return unique, positions, quoted
+
+
+def _parse_categories(sources, workers):
+    """按 sources 顺序产出 (分类名, 路径, 解析结果, 错误信息)；workers > 1 时在进程池中并行解析"""
+    if workers <= 1 or len(sources) <= 1:
+        for name, path in sources:
+            try:
+                yield name, path, parse_category(path), None
+            except OSError as e:
+                yield name, path, None, str(e)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(sources))) as pool:
+        futures = [(name, path, pool.submit(parse_category, path)) for name, path in sources]
+        try:
+            for i, (name, path, future) in enumerate(futures):
+                futures[i] = None   # 取出结果后不再持有，已并入的文件随即释放
+                try:
+                    yield name, path, future.result(), None
+                except OSError as e:
+                    yield name, path, None, str(e)
+        finally:
+            # 提前结束（遇到非纯数字文件）时不再等待尚未开始的解析
+            pool.shutdown(cancel_futures=True)
+
+
+class VidIndex:
+    """
+    唯一 VID 表 + 每个 VID 的所属分类 + 每个分类的条目位置
+    VID 一律按字符串比较（与 shop_info 的键一致）；分类名为文件名去掉 .json
+    """
+
+    def __init__(self, sources, workers=1):
+        """
+        sources: [(分类名, 文件路径)]；无法解析的文件记入 errors 并跳过
+        workers > 1 时向量化模式在进程池中并行解析各分类文件
+        """
+        sources = list(sources)
+        self.vectorized = (np is not None and len(sources) <= MAX_VECTOR_CATEGORIES
+                           and self._build_vectorized(sources, workers))
+        if not self.vectorized:
+            self._build_generic(sources)
+
+    @classmethod
+    def build(cls, folder, names=None, workers=1):
+        """索引目录下的 *.json（按文件名排序）；names 非空时只索引这些分类"""
+        sources = []
+        for filename in sorted(os.listdir(folder)):
+            name, ext = os.path.splitext(filename)
+            if ext == '.json' and (names is None or name in names):
+                sources.append((name, os.path.join(folder, filename)))
+        return cls(sources, workers)
+
+    def _build_vectorized(self, sources, workers):
+        """
+        逐个文件并入唯一 VID 表：每个文件只保留文件内唯一 VID 与 uint32 位置，解析用的大数组随即释放
+        全部并入后再把文件内位置换算为唯一 VID 表中的位置；遇到非纯数字文件时返回 False
+        """
+        self.paths, self.errors, self._quoted = {}, {}, {}
+        universe = np.empty(0, dtype=np.uint64)
+        local = {}
+        for name, path, result, error in _parse_categories(sources, workers):
+            if error is not None:
+                self.errors[name] = error
+                continue
+            if result is None:
+                return False
+            unique, positions, self._quoted[name] = result
+            universe = sorted_unique(np.concatenate((universe, unique)))
+            local[name] = (unique, positions)
+            self.paths[name] = path
+        self.categories = list(self.paths)
+        self._universe = universe
+        self._positions = {}
+        dtype = _position_dtype(len(universe))
+        for name in self.categories:
+            unique, positions = local.pop(name)
+            self._positions[name] = np.searchsorted(universe, unique).astype(dtype)[positions]
+        self._mask_cache = None   # 所属分类位掩码只在查询时计算（清洗不需要）
+        return True
+
+    @property
+    def _masks(self):
+        if self._mask_cache is None:
+            masks = np.zeros(len(self._universe), dtype=np.uint64)
+            for bit, name in enumerate(self.categories):
+                masks[self._positions[name]] |= np.uint64(1 << bit)
+            self._mask_cache = masks
+        return self._mask_cache
+
+    def _build_generic(self, sources):
+        """
+        逐项模式：流式读取各文件，只保留唯一 VID 表与每个分类的位置数组（array('Q')），不保存条目本身
+        导出时重新流式读取原文件取回条目（保持原类型与引号）；文件中途解析失败时撤销已并入的部分
+        """
+        self.paths, self.errors = {}, {}
+        self._positions = {}
+        self._ids = {}
+        self._universe = []
+        self._mask_cache = []
+        for name, path in sources:
+            bit = 1 << len(self.paths)
+            start = len(self._universe)
+            positions = array('Q')
+            try:
+                for item in iter_vids(path):
+                    key = str(item)
+                    pos = self._ids.get(key)
+                    if pos is None:
+                        pos = self._ids[key] = len(self._universe)
+                        self._universe.append(key)
+                        self._mask_cache.append(0)
+                    self._mask_cache[pos] |= bit
+                    positions.append(pos)
+            except (OSError, ValueError) as e:
+                self.errors[name] = str(e)
+                for key in self._universe[start:]:
+                    del self._ids[key]
+                del self._universe[start:], self._mask_cache[start:]
+                for pos in positions:
+                    self._mask_cache[pos] &= ~bit
+                continue
+            self.paths[name] = path
+            self._positions[name] = positions
+        self.categories = list(self.paths)
+
+    # ---------- 查询 ----------
+
+    def __len__(self):
+        """唯一 VID 数量"""
+        return len(self._universe)
+
+    def entries(self, name=None):
+        """分类（默认全部分类）的条目总数，含重复"""
+        names = self.categories if name is None else [name]
+        return sum(len(self._positions[n]) for n in names)
+
+    def _position(self, vid):
+        if not self.vectorized:
+            return self._ids.get(str(vid))
+        array = VidArray([vid], strict=False).ints()
+        if not len(array):
+            return None
+        pos = int(np.searchsorted(self._universe, array[0]))
+        return pos if pos < len(self._universe) and self._universe[pos] == array[0] else None
+
+    def __contains__(self, vid):
+        return self._position(vid) is not None
+
+    def _names(self, mask):
+        mask = int(mask)
+        return [name for bit, name in enumerate(self.categories) if mask >> bit & 1]
+
+    def categories_of(self, vid):
+        """VID 所属的分类列表（按文件名顺序），不在任何分类中时返回空列表"""
+        pos = self._position(vid)
+        return [] if pos is None else self._names(self._masks[pos])
+
+    def vids(self):
+        """全部唯一 VID（字符串）"""
+        if self.vectorized:
+            return list(map(str, self._universe.tolist()))
+        return list(self._universe)
+
+    def members(self, name):
+        """分类中的 VID（字符串，保持原顺序与重复）"""
+        if self.vectorized:
+            return list(map(str, self._universe[self._positions[name]].tolist()))
+        return [str(item) for item in iter_vids(self.paths[name])]
+
+    def unique_to(self, name):
+        """只出现在该分类中的 VID（字符串，按唯一 VID 表顺序）"""
+        bit = 1 << self.categories.index(name)
+        if self.vectorized:
+            return list(map(str, self._universe[self._masks == np.uint64(bit)].tolist()))
+        return [key for key, mask in zip(self._universe, self._masks) if mask == bit]
+
+    def category_counts(self):
+        """每个分类的 (条目数, 唯一 VID 数, 独有 VID 数)"""
+        counts = {}
+        for bit, name in enumerate(self.categories):
+            positions = self._positions[name]
+            if self.vectorized:
+                distinct = len(sorted_unique(positions))
+                only = int(np.count_nonzero(self._masks == np.uint64(1 << bit)))
+            else:
+                distinct = len(set(positions))
+                only = sum(1 for mask in self._masks if mask == 1 << bit)
+            counts[name] = (len(positions), distinct, only)
+        return counts
+
+    def overlap(self, a, b):
+        """同时出现在分类 a 与 b 中的唯一 VID 数量"""
+        both = (1 << self.categories.index(a)) | (1 << self.categories.index(b))
+        if self.vectorized:
+            return int(np.count_nonzero((self._masks & np.uint64(both)) == np.uint64(both)))
+        return sum(1 for mask in self._masks if mask & both == both)
+
+    # ---------- 按唯一 VID 计算一次，映射回各分类 ----------
+
+    def lookup(self, vid_set):
+        """
+        唯一 VID 是否属于 vid_set（字符串集合），每个唯一 VID 只判断一次
+        返回与唯一 VID 表等长的布尔序列，供 any_in / write_filtered 使用
+        """
+        if self.vectorized:
+            # 非规范数字的字符串不可能出现在纯数字文件中，跳过不影响结果
+            return VidArray(vid_set, strict=False).contains_many(self._universe)
+        return [key in vid_set for key in self._universe]
+
+    def any_in(self, name, mask):
+        """分类中是否有任一条目在 lookup 结果中为真"""
+        if self.vectorized:
+            return bool(mask[self._positions[name]].any())
+        return any(mask[pos] for pos in self._positions[name])
+
+    def write_filtered(self, name, mask, path):
+        """
+        只保留 lookup 结果为真的条目写出分类文件（保持原顺序、重复与引号风格）
+        分块格式化、边写边比较（json_io.write_chunks_if_changed），内存不随输出文本大小增长；
+        结果与现有文件相同时不重写，返回 (原条目数, 保留条目数, 是否写出)
+        """
+        positions = self._positions[name]
+        if self.vectorized:
+            kept = self._universe[positions[mask[positions]]]
+            written = write_chunks_if_changed(path, iter_id_array(kept, quoted=self._quoted[name]))
+            return len(positions), len(kept), written
+        kept = 0
+
+        def kept_items():
+            # 逐项模式不保存条目，重新流式读取原文件取回（保持原类型）
+            nonlocal kept
+            for item, pos in zip(iter_vids(self.paths[name]), positions):
+                if mask[pos]:
+                    kept += 1
+                    yield item
+
+        written = write_chunks_if_changed(path, iter_dumps_lines(kept_items()))
+        return len(positions), kept, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分类文件的跨分类 VID 索引")
+    parser.add_argument("folder", nargs="?", default="oldvid")
+    parser.add_argument("--vid", help="查询 VID 所属的分类")
+    parser.add_argument("--unique", metavar="CATEGORY", help="列出只出现在该分类中的 VID")
+    args = parser.parse_args()
+
+    index = VidIndex.build(args.folder)
+    for name, error in index.errors.items():
+        print(f"⚠️ {name} 无法解析: {error}")
+    if args.vid:
+        print(json.dumps(index.categories_of(args.vid), ensure_ascii=False))
+    elif args.unique:
+        print(json.dumps(index.unique_to(args.unique), ensure_ascii=False, indent=2))
+    else:
+        mode = "向量化" if index.vectorized else "逐项"
+        print(f"{len(index.categories)} 个分类，唯一 VID {len(index)} 个（{mode}模式）")
+        for name, (total, distinct, only) in index.category_counts().items():
+            print(f"  {name}: {total} 条，唯一 {distinct}，独有 {only}")
+        for i, a in enumerate(index.categories):
+            for b in index.categories[i + 1:]:
+                print(f"  {a} ∩ {b}: {index.overlap(a, b)}")
+
+
+if __name__ == "__main__":
+    main()
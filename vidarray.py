@@ -0,0 +1,325 @@
+"""
+紧凑 VID 容器：排序去重的 uint64 数组
+- 内存：每个 VID 8 字节（JSON 字符串列表每个 VID 约 60 字节）
+- 集合运算（并 / 交 / 差）与批量成员判断走 NumPy 向量化，未安装时退回 array + 集合运算
+- 二进制格式可直接 mmap：16 字节文件头 + 小端 uint64 数组
+- 保留 JSON 导入导出，与现有 *.json 文件互通
+
+用法:
+    python vidarray.py convert old_vid.json old_vid.vids
+    python vidarray.py diff old_vid.json new_vid.json
+"""
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from json_io import load_bytes, write_chunks_if_changed
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ================= 配置区 =================
+MAGIC = b"VIDS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")   # magic, version, 保留, 数量
+MAX_DIGITS = 18                    # 超过 uint64 安全范围的 VID 不收录
+FORMAT_CHUNK = 10000               # 流式写出时每批格式化的 VID 数
+# =========================================
+
+# 只包含规范数字（或带引号的规范数字）的 JSON 数组
+_ELEM = rb'(?:"(?:0|[1-9]\d{0,%d})"|(?:0|[1-9]\d{0,%d}))' % (MAX_DIGITS - 1, MAX_DIGITS - 1)
+_NUMERIC_ARRAY_RE = re.compile(rb'\s*\[\s*(?:' + _ELEM + rb'\s*(?:,\s*' + _ELEM + rb'\s*)*)?\]\s*')
+# 大文件在逗号处分段校验，各段依次为：开头段、中间段、结尾段
+_ELEM_LIST = rb'\s*' + _ELEM + rb'\s*(?:,\s*' + _ELEM + rb'\s*)*'
+_HEAD_RE = re.compile(rb'\s*\[' + _ELEM_LIST)
+_MIDDLE_RE = re.compile(_ELEM_LIST)
+_TAIL_RE = re.compile(_ELEM_LIST + rb'\]\s*')
+_VALIDATE_CHUNK = 1 << 16
+_DIGITS_ONLY = bytes(c if 48 <= c <= 57 else 32 for c in range(256))
+
+
+def _to_int(vid):
+    """VID 转整数；非规范数字（如 "0123"、"abc"）返回 None"""
+    if isinstance(vid, int) and 0 <= vid < 10 ** MAX_DIGITS:
+        return vid
+    if (isinstance(vid, str) and vid.isdigit() and vid.isascii() and len(vid) <= MAX_DIGITS
+            and (vid[0] != '0' or vid == '0')):
+        return int(vid)
+    return None
+
+
+def sorted_unique(values):
+    """排序去重为 uint64 数组；NumPy 下用排序 + 相邻比较，比 np.unique 快一个数量级"""
+    if np is None:
+        return array('Q', sorted(set(values)))
+    data = np.sort(np.asarray(values, dtype=np.uint64))
+    if len(data) > 1:
+        data = data[np.concatenate(([True], data[1:] != data[:-1]))]
+    return data
+
+
+def _is_numeric_array(data):
+    """
+    与 _NUMERIC_ARRAY_RE.fullmatch(data) 等价
+    re 在重复组的每次迭代都保留回溯状态，整文件匹配数百万条时内存达数百 MB；
+    元素内不含逗号，因此在逗号处切分后逐段匹配，内存只与段长有关
+    """
+    if len(data) <= _VALIDATE_CHUNK:
+        return _NUMERIC_ARRAY_RE.fullmatch(data) is not None
+    start, pattern = 0, _HEAD_RE
+    while True:
+        cut = data.find(b',', start + _VALIDATE_CHUNK)
+        if cut < 0:
+            tail = _NUMERIC_ARRAY_RE if pattern is _HEAD_RE else _TAIL_RE
+            return tail.fullmatch(data, start) is not None
+        if pattern.fullmatch(data, start, cut) is None:
+            return False
+        start, pattern = cut + 1, _MIDDLE_RE
+
+
+def parse_id_array(data):
+    """
+    解析只含规范数字的 JSON 数组（bytes），不为每个元素创建 Python 对象
+    返回 (整数数组, 元素是否带引号)，保持原顺序与重复；格式不符或引号混用时返回 None
+    """
+    if not _is_numeric_array(data):
+        return None
+    n = data.count(b',') + 1 if re.search(rb'\d', data) else 0
+    quotes = data.count(b'"')
+    if quotes not in (0, 2 * n):
+        return None
+    if n == 0:
+        return (np.empty(0, dtype=np.uint64) if np is not None else array('Q')), quotes > 0
+    text = data.translate(_DIGITS_ONLY)
+    if np is not None:
+        ints = np.fromstring(text.decode('ascii'), dtype=np.uint64, sep=' ')
+    else:
+        ints = array('Q', map(int, text.split()))
+    return ints, quotes > 0
+
+
+def iter_id_array(ints, quoted=True, indent=0, chunk_size=FORMAT_CHUNK):
+    """
+    把整数序列分块格式化为 JSON 数组文本片段，每次只把 chunk_size 个整数转成字符串，
+    拼接结果与 json.dumps(indent=indent) 一致；indent=0 时与 json_io.dumps_lines 一致
+    """
+    if not len(ints):
+        yield '[]'
+        return
+    pad = ' ' * indent
+    quote = '"' if quoted else ''
+    sep = quote + ',\n' + pad + quote
+    yield '[\n' + pad + quote
+    for start in range(0, len(ints), chunk_size):
+        text = sep.join(map(str, ints[start:start + chunk_size].tolist()))
+        yield text if start == 0 else sep + text
+    yield quote + '\n]'
+
+
+def format_id_array(ints, quoted=True, indent=0):
+    """整体格式化为 JSON 数组文本（小数组用；大文件用 iter_id_array 流式写出）"""
+    return ''.join(iter_id_array(ints, quoted, indent))
+
+
+class VidArray:
+    """
+    排序去重的整数 VID 集合，迭代时按数值升序返回字符串
+    strict=False 时跳过非规范数字的 VID（它们只能出现在走兼容路径的文件里）
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, vids=(), strict=True):
+        ints = []
+        for vid in vids:
+            value = _to_int(vid)
+            if value is None:
+                if strict:
+                    raise ValueError(f"VID 不是规范数字: {vid!r}")
+                continue
+            ints.append(value)
+        self._data = sorted_unique(ints)
+
+    @classmethod
+    def _wrap(cls, data):
+        obj = cls.__new__(cls)
+        obj._data = data
+        return obj
+
+    @classmethod
+    def from_ints(cls, ints):
+        """从整数数组构建（会排序去重）"""
+        return cls._wrap(sorted_unique(ints))
+
+    # ---------- 基本接口 ----------
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return map(str, self._data.tolist())
+
+    def __contains__(self, vid):
+        value = _to_int(vid)
+        if value is None:
+            return False
+        data = self._data
+        if np is not None:
+            i = int(np.searchsorted(data, np.uint64(value)))
+        else:
+            i = bisect_left(data, value)
+        return i < len(data) and int(data[i]) == value
+
+    def __eq__(self, other):
+        if not isinstance(other, VidArray):
+            return NotImplemented
+        return len(self) == len(other) and self._data.tolist() == other._data.tolist()
+
+    def __repr__(self):
+        return f"VidArray({len(self)} 个 VID)"
+
+    def ints(self):
+        """底层排序整数数组（NumPy 或 array('Q')）"""
+        return self._data
+
+    def to_list(self):
+        return list(self)
+
+    @property
+    def nbytes(self):
+        return len(self._data) * 8
+
+    # ---------- 集合运算 ----------
+
+    def contains_many(self, ints):
+        """批量成员判断，返回与 ints 等长的布尔序列（NumPy 下为布尔数组）"""
+        if np is not None:
+            # 自身已排序去重，二分查找即可，无需 np.isin 再排序一次
+            ints = np.asarray(ints, dtype=np.uint64)
+            data = self._data
+            if not len(data):
+                return np.zeros(len(ints), dtype=bool)
+            return data[np.minimum(np.searchsorted(data, ints), len(data) - 1)] == ints
+        members = set(self._data)
+        return [v in members for v in ints]
+
+    def union(self, other):
+        if np is not None:
+            return VidArray._wrap(sorted_unique(np.concatenate([self._data, other._data])))
+        return VidArray._wrap(array('Q', sorted(set(self._data).union(other._data))))
+
+    def intersection(self, other):
+        if np is not None:
+            return VidArray._wrap(self._data[other.contains_many(self._data)])
+        return VidArray._wrap(array('Q', sorted(set(self._data).intersection(other._data))))
+
+    def difference(self, other):
+        if np is not None:
+            return VidArray._wrap(self._data[~other.contains_many(self._data)])
+        return VidArray._wrap(array('Q', sorted(set(self._data).difference(other._data))))
+
+    def symmetric_difference(self, other):
+        if np is not None:
+            return VidArray._wrap(np.setxor1d(self._data, other._data, assume_unique=True))
+        return VidArray._wrap(array('Q', sorted(set(self._data).symmetric_difference(other._data))))
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+
+    # ---------- 文件读写 ----------
+
+    @classmethod
+    def load_json(cls, path):
+        """读取 JSON 数组；纯数字文件走向量化解析，否则逐项转换（跳过非规范数字）"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        parsed = parse_id_array(data)
+        if parsed is not None:
+            return cls.from_ints(parsed[0])
+        return cls(load_bytes(data, path=path), strict=False)
+
+    def save_json(self, path, indent=0, quoted=True):
+        """写出 JSON 数组，内容未变时不重写；返回是否写出"""
+        return write_chunks_if_changed(path, iter_id_array(self._data, quoted=quoted, indent=indent))
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        """读取二进制格式；use_mmap 且有 NumPy 时直接映射文件，不复制数据"""
+        with open(path, 'rb') as f:
+            magic, version, _, count = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不是 VID 二进制文件: {path}")
+            if np is not None and use_mmap:
+                if count == 0:
+                    return cls._wrap(np.empty(0, dtype=np.uint64))
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                return cls._wrap(np.frombuffer(mm, dtype='<u8', count=count, offset=HEADER.size))
+            data = array('Q')
+            data.frombytes(f.read(count * 8))
+            if sys.byteorder != 'little':
+                data.byteswap()
+            if np is not None:
+                data = np.asarray(data, dtype=np.uint64)
+            return cls._wrap(data)
+
+    def save(self, path):
+        """写出二进制格式（先写临时文件再替换）"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(self._data)))
+            if np is not None:
+                f.write(np.asarray(self._data, dtype='<u8').tobytes())
+            else:
+                data = array('Q', self._data)
+                if sys.byteorder != 'little':
+                    data.byteswap()
+                f.write(data.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path):
+        """按扩展名读取：.json 为 JSON，其余为二进制"""
+        return cls.load_json(path) if path.endswith('.json') else cls.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VID 库格式转换与集合对比")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="在 JSON 与二进制格式之间转换（按扩展名判断）")
+    convert.add_argument("src")
+    convert.add_argument("dst")
+    diff = sub.add_parser("diff", help="对比两个 VID 库")
+    diff.add_argument("a")
+    diff.add_argument("b")
+    diff.add_argument("--output", help="把 a - b 写入文件（按扩展名选择格式）")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        vids = VidArray.open(args.src)
+        if args.dst.endswith('.json'):
+            vids.save_json(args.dst)
+        else:
+            vids.save(args.dst)
+        print(f"已转换 {len(vids)} 个 VID: {args.src} -> {args.dst}")
+    else:
+        a, b = VidArray.open(args.a), VidArray.open(args.b)
+        only_a = a - b
+        print(f"{args.a}: {len(a)}，{args.b}: {len(b)}")
+        print(f"交集: {len(a & b)}，仅在 {args.a}: {len(only_a)}，仅在 {args.b}: {len(b - a)}")
+        if args.output:
+            if args.output.endswith('.json'):
+                only_a.save_json(args.output)
+            else:
+                only_a.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+from json_io import load_json, dump_json
+from shard_store import load_items, dump_items
+
+
+class VidSet:
+    """有序、带哈希索引的 VID 集合：判重与定位均为 O(1)，迭代保持插入顺序"""
+
+    def __init__(self, vids=()):
+        self._items = []
+        self._pos = {}
+        for vid in vids:
+            self.add(vid)
+
+    def add(self, vid):
+        """追加 VID，已存在时不重复添加；返回是否为新增"""
+        vid = str(vid)
+        if vid in self._pos:
+            return False
+        self._pos[vid] = len(self._items)
+        self._items.append(vid)
+        return True
+
+    def position(self, vid, default=None):
+        """返回 VID 所在下标，不存在时返回 default"""
+        return self._pos.get(str(vid), default)
+
+    def __contains__(self, vid):
+        return str(vid) in self._pos
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def to_list(self):
+        return list(self._items)
+
+    @classmethod
+    def load(cls, path):
+        """读取 JSON 数组或列表分片目录（见 shard_store）"""
+        return cls(load_items(path))
+
+    def save(self, path):
+        """内容未变的文件（分片）不重写，返回是否有文件被改写"""
+        return dump_items(path, self._items)
+
+
+def load_cursor(path):
+    """读取断点（同步断点、扫描轮转断点格式相同），文件不存在或损坏时返回 None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        cursor = load_json(path)
+    except (ValueError, OSError):
+        return None
+    return cursor if isinstance(cursor, dict) else None
+
+
+def save_cursor(path, next_index, last_vid):
+    """
+    保存同步断点：下一次从 next_index 开始，last_vid 为最后一个已确认处理的旧库 VID
+    断点不带时间戳，位置未变时不改写文件（运行时间见运行报告）
+    """
+    return dump_json(path, {"next_index": next_index, "last_vid": last_vid})
+
+
+def cursor_start(cursor, position, size):
+    """
+    按断点计算起点，返回 (start_index, 说明)；没有断点或断点无法对齐时返回 None
+    优先使用 last_vid 的当前位置（列表被编辑后仍能对齐），其次使用 next_index
+    position(vid) 返回 VID 在列表中的下标，不存在时返回 None
+    """
+    if not cursor:
+        return None
+    last_vid = cursor.get("last_vid")
+    pos = position(last_vid) if last_vid is not None else None
+    if pos is not None:
+        return pos + 1, f"断点 VID {last_vid}"
+    next_index = cursor.get("next_index")
+    if isinstance(next_index, int) and 0 <= next_index <= size:
+        return next_index, f"断点索引 {next_index}"
+    return None
+
+
+def resolve_start(old_vids, new_vids, cursor):
+    """
+    计算本次遍历旧库的起点，返回 (start_index, 说明)
+    优先使用持久化断点中的 last_vid（旧库被编辑后仍能对齐），其次使用 next_index，
+    没有断点时才退回到旧逻辑：以新库最后一个 VID 在旧库中的位置作为断点。
+    """
+    start = cursor_start(cursor, old_vids.position, len(old_vids))
+    if start:
+        return start
+
+    if len(new_vids):
+        pos = old_vids.position(new_vids[-1])
+        if pos is not None:
+            return pos + 1, f"新库末尾 VID {new_vids[-1]}"
+    return 0, None